@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, Response, Request
 from pydantic import BaseModel
 from database import db
+from permission_cache import invalidate_permissions
 import bcrypt
 import uuid
 import random
@@ -365,6 +366,8 @@ async def update_user(user_id: str, user: UpdateUserRequest):
             params.append(user_id)
             query = f"UPDATE users SET {', '.join(updates)} WHERE id = %s"
             db.execute_update(query, tuple(params))
+            if user.role:
+                invalidate_permissions(user_id=user_id)
         
         return {"success": True}
     except Exception as e:
@@ -380,6 +383,8 @@ async def delete_user(user_id: str):
         if affected == 0:
             raise HTTPException(status_code=404, detail="User not found")
         
+        invalidate_permissions(user_id=user_id)
+        
         return {"success": True}
     except HTTPException:
         raise
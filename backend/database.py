@@ -1,10 +1,48 @@
 import pymysql
 from dotenv import load_dotenv
+import asyncio
 import os
-from typing import Dict, List, Optional, Any
+import queue
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Dict, List, Optional, Any
 
 load_dotenv()
 
+@lru_cache(maxsize=256)
+def build_update_sql(table: str, columns: tuple, where: str, touch_updated_at: bool = False) -> str:
+    """Build an UPDATE for the given columns, once per distinct column set"""
+    assignments = [f"{column} = %s" for column in columns]
+    if touch_updated_at:
+        assignments.append("updated_at = CURRENT_TIMESTAMP")
+    return f"UPDATE {table} SET {', '.join(assignments)} WHERE {where}"
+
+class Transaction:
+    """Queries bound to one pooled connection and committed together"""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _run(self, query: str, params: tuple, fetch: bool):
+        with self.conn.cursor() as cursor:
+            affected = cursor.execute(query, params or ())
+            return cursor.fetchall() if fetch else affected
+
+    async def fetch(self, query: str, params: tuple = None) -> List[Dict]:
+        """Run a SELECT inside the transaction"""
+        return await asyncio.to_thread(self._run, query, params, True)
+
+    async def execute(self, query: str, params: tuple = None) -> int:
+        """Run a write inside the transaction and return affected rows"""
+        return await asyncio.to_thread(self._run, query, params, False)
+
+    def _run_many(self, query: str, params_list: List[tuple]) -> int:
+        with self.conn.cursor() as cursor:
+            return cursor.executemany(query, params_list)
+
+    async def execute_many(self, query: str, params_list: List[tuple]) -> int:
+        """Run a batched write (one multi-row INSERT) inside the transaction"""
+        return await asyncio.to_thread(self._run_many, query, params_list)
+
 class Database:
     def __init__(self):
         self.config = {
@@ -16,10 +54,43 @@ class Database:
             'charset': 'utf8mb4',
             'cursorclass': pymysql.cursors.DictCursor
         }
+        # Idle connections kept open between calls (LIFO so the warmest one is reused first)
+        self.pool_size = int(os.getenv('DB_POOL_SIZE', '10'))
+        self._pool = queue.LifoQueue(maxsize=self.pool_size)
 
     def get_connection(self):
-        """Get database connection"""
-        return pymysql.connect(**self.config)
+        """Get a database connection from the pool, opening a new one if none is idle"""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            return pymysql.connect(**self.config)
+        try:
+            conn.ping(reconnect=True)
+        except Exception:
+            self._close_quietly(conn)
+            return pymysql.connect(**self.config)
+        return conn
+
+    def release_connection(self, conn):
+        """Return a connection to the pool, closing it if the pool is full or it is broken"""
+        try:
+            # End any open read snapshot so the next user sees fresh data
+            conn.rollback()
+            self._pool.put_nowait(conn)
+        except Exception:
+            self._close_quietly(conn)
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def warm_pool(self, size: int = None):
+        """Open connections up front so the first requests skip the handshake"""
+        conns = [self.get_connection() for _ in range(size or self.pool_size)]
+        for conn in conns:
+            self.release_connection(conn)
 
     def execute_query(self, query: str, params: tuple = None) -> List[Dict]:
         """Execute SELECT query and return results"""
@@ -29,7 +100,17 @@ class Database:
                 cursor.execute(query, params or ())
                 return cursor.fetchall()
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+    def execute_query_one(self, query: str, params: tuple = None) -> Optional[Dict]:
+        """Execute a single-row SELECT (primary key lookup) and return the row or None"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params or ())
+                return cursor.fetchone()
+        finally:
+            self.release_connection(conn)
 
     def execute_update(self, query: str, params: tuple = None) -> int:
         """Execute INSERT/UPDATE/DELETE query and return affected rows"""
@@ -43,7 +124,37 @@ class Database:
             conn.rollback()
             raise e
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+    def execute_returning(self, query: str, params: tuple, select_query: str, select_params: tuple = None) -> List[Dict]:
+        """Execute a write and re-select the affected row on the same connection, committing once"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params or ())
+                cursor.execute(select_query, select_params or ())
+                rows = cursor.fetchall()
+                conn.commit()
+                return rows
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            self.release_connection(conn)
+
+    def execute_many(self, query: str, params_list: List[tuple]) -> int:
+        """Execute a write for each params tuple in one round-trip (multi-row INSERT) and commit"""
+        conn = self.get_connection()
+        try:
+            with conn.cursor() as cursor:
+                affected = cursor.executemany(query, params_list)
+                conn.commit()
+                return affected
+        except Exception as e:
+            conn.rollback()
+            raise e
+        finally:
+            self.release_connection(conn)
 
     def execute_insert(self, query: str, params: tuple = None) -> str:
         """Execute INSERT query and return last insert id"""
@@ -57,7 +168,70 @@ class Database:
             conn.rollback()
             raise e
         finally:
-            conn.close()
+            self.release_connection(conn)
+
+    # Async variants: run the blocking call in a worker thread so the event loop keeps serving
+    async def fetch(self, query: str, params: tuple = None) -> List[Dict]:
+        """Async execute_query"""
+        return await asyncio.to_thread(self.execute_query, query, params)
+
+    async def fetch_one(self, query: str, params: tuple = None) -> Optional[Dict]:
+        """Async execute_query_one"""
+        return await asyncio.to_thread(self.execute_query_one, query, params)
+
+    async def execute(self, query: str, params: tuple = None) -> int:
+        """Async execute_update"""
+        return await asyncio.to_thread(self.execute_update, query, params)
+
+    async def execute_batch(self, query: str, params_list: List[tuple]) -> int:
+        """Async execute_many"""
+        return await asyncio.to_thread(self.execute_many, query, params_list)
+
+    async def returning(self, query: str, params: tuple, select_query: str, select_params: tuple = None) -> List[Dict]:
+        """Async execute_returning"""
+        return await asyncio.to_thread(self.execute_returning, query, params, select_query, select_params)
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Transaction]:
+        """Run several statements on one connection with a single COMMIT (rolled back on error)"""
+        conn = await asyncio.to_thread(self.get_connection)
+        try:
+            yield Transaction(conn)
+            await asyncio.to_thread(conn.commit)
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            self.release_connection(conn)
+
+    async def stream(self, query: str, params: tuple = None, batch_size: int = 500) -> AsyncIterator[List[Dict]]:
+        """Yield result rows in batches from an unbuffered server-side cursor"""
+        conn = await asyncio.to_thread(self.get_connection)
+        cursor = conn.cursor(pymysql.cursors.SSDictCursor)
+        exhausted = False
+        try:
+            await asyncio.to_thread(cursor.execute, query, params or ())
+            while True:
+                rows = await asyncio.to_thread(cursor.fetchmany, batch_size)
+                if not rows:
+                    exhausted = True
+                    break
+                yield rows
+        finally:
+            # Closing an unbuffered cursor drains its unread rows over the network, which would block
+            # the event loop when a consumer stops early: drop the connection instead of draining it
+            if exhausted:
+                try:
+                    cursor.close()
+                except Exception:
+                    exhausted = False
+            if exhausted:
+                self.release_connection(conn)
+            else:
+                self._close_quietly(conn)
 
 # Global database instance
 db = Database()
\ No newline at end of file
@@ -1,12 +1,25 @@
 import subprocess
 import os
+import logging
 import smtplib
+from contextlib import contextmanager
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Per-send lines are INFO so they cost nothing unless the level is lowered
+log = logging.getLogger(__name__)
+
+# Mail settings are fixed for the life of the process, so read them once
+MAIL_HOST = os.getenv('MAIL_HOST', 'in-v3.mailjet.com')
+MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
+MAIL_USERNAME = os.getenv('MAIL_USERNAME', '')
+MAIL_PASSWORD = os.getenv('MAIL_PASSWORD', '')
+MAIL_FROM = f"{os.getenv('MAIL_FROM_NAME', 'MarkD')} <{os.getenv('MAIL_FROM_ADDRESS', 'xavier@ooo.ovh')}>"
+EMAIL_TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), 'email_templates')
+
 def compile_mjml_template(template_path: str) -> str:
     """Compile MJML template to HTML"""
     try:
@@ -18,40 +31,40 @@ def compile_mjml_template(template_path: str) -> str:
         )
         return result.stdout
     except Exception as e:
-        print(f"Error compiling MJML: {e}")
+        log.error("Error compiling MJML: %s", e)
         return None
 
-def send_email(to_email: str, subject: str, html_content: str) -> bool:
-    """Send email using SMTP (Mailjet)"""
+@contextmanager
+def smtp_connection():
+    """Open one authenticated SMTP session that several sends can share"""
+    with smtplib.SMTP(MAIL_HOST, MAIL_PORT) as server:
+        server.starttls()
+        server.login(MAIL_USERNAME, MAIL_PASSWORD)
+        yield server
+
+def send_email(to_email: str, subject: str, html_content: str, smtp_client: smtplib.SMTP = None) -> bool:
+    """Send email using SMTP (Mailjet), reusing smtp_client when given"""
     try:
-        smtp_host = os.getenv('MAIL_HOST', 'in-v3.mailjet.com')
-        smtp_port = int(os.getenv('MAIL_PORT', 587))
-        smtp_user = os.getenv('MAIL_USERNAME', '')
-        smtp_password = os.getenv('MAIL_PASSWORD', '')
-        from_email = os.getenv('MAIL_FROM_ADDRESS', 'xavier@ooo.ovh')
-        from_name = os.getenv('MAIL_FROM_NAME', 'MarkD')
-        
         msg = MIMEMultipart('alternative')
         msg['Subject'] = subject
-        msg['From'] = f'{from_name} <{from_email}>'
+        msg['From'] = MAIL_FROM
         msg['To'] = to_email
         
         # Add HTML part
         html_part = MIMEText(html_content, 'html', 'utf-8')
         msg.attach(html_part)
         
-        # Send email via Mailjet SMTP
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
-            server.send_message(msg)
+        # Send email via Mailjet SMTP, over the caller's session when batching
+        if smtp_client is not None:
+            smtp_client.send_message(msg)
+        else:
+            with smtp_connection() as server:
+                server.send_message(msg)
         
-        print(f"Email sent successfully to {to_email}")
+        log.info("Email sent successfully to %s", to_email)
         return True
     except Exception as e:
-        print(f"Error sending email: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error sending email to %s: %s", to_email, e)
         return False
 
 def send_password_reset_email(to_email: str, username: str, code: str) -> bool:
@@ -74,9 +87,9 @@ def send_password_reset_email(to_email: str, username: str, code: str) -> bool:
         html_content
     )
 
-def send_task_assignment_email(to_email: str, username: str, task_title: str, task_url: str, assigned_by: str) -> bool:
+def send_task_assignment_email(to_email: str, username: str, task_title: str, task_url: str, assigned_by: str, smtp_client: smtplib.SMTP = None) -> bool:
     """Send email when user is assigned to a task"""
-    mjml_template = os.path.join(os.path.dirname(__file__), 'email_templates', 'task_assignment.mjml')
+    mjml_template = os.path.join(EMAIL_TEMPLATES_DIR, 'task_assignment.mjml')
     
     html_content = compile_mjml_template(mjml_template)
     if not html_content:
@@ -90,11 +103,11 @@ def send_task_assignment_email(to_email: str, username: str, task_title: str, ta
     
     subject = f"MarkD - New task assigned: {task_title}"
     
-    return send_email(to_email, subject, html_content)
+    return send_email(to_email, subject, html_content, smtp_client)
 
-def send_task_due_date_reminder(to_email: str, username: str, task_title: str, task_url: str, due_date: str) -> bool:
+def send_task_due_date_reminder(to_email: str, username: str, task_title: str, task_url: str, due_date: str, smtp_client: smtplib.SMTP = None) -> bool:
     """Send email reminder for task due date"""
-    mjml_template = os.path.join(os.path.dirname(__file__), 'email_templates', 'task_due_reminder.mjml')
+    mjml_template = os.path.join(EMAIL_TEMPLATES_DIR, 'task_due_reminder.mjml')
     
     html_content = compile_mjml_template(mjml_template)
     if not html_content:
@@ -108,4 +121,4 @@ def send_task_due_date_reminder(to_email: str, username: str, task_title: str, t
     
     subject = f"MarkD - Due date reminder: {task_title}"
     
-    return send_email(to_email, subject, html_content)
+    return send_email(to_email, subject, html_content, smtp_client)
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends, Query, File, UploadFile
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, List, Any
+from typing import Optional, Dict, List, Any, Tuple
 from database import db
+from permission_cache import get_cached_permission
 from websocket_broadcasts import broadcast_file_tree_update, broadcast_file_lock_update, broadcast_file_content_updated
 import uuid
 import os
+import asyncio
+import aiofiles
 import hashlib
 import shutil
 from pathlib import Path
@@ -36,6 +39,11 @@ def get_workspace_permission_sync(user_id: int, workspace_id: str, user_role: st
     if user_role == 'admin':
         return 'admin'
     
+    return get_cached_permission('files', user_id, workspace_id,
+                                 lambda: load_workspace_permission(user_id, workspace_id))
+
+def load_workspace_permission(user_id: int, workspace_id: str) -> str:
+    """Resolve user permission for workspace from the database"""
     # Also check in database if role not provided
     user_query = "SELECT role FROM users WHERE id = %s"
     user_result = db.execute_query(user_query, (user_id,))
@@ -221,13 +229,39 @@ def update_file_tags(file_id: str, tag_names: List[str]) -> List[Dict[str, Any]]
 
     return desired_tags
 
-def calculate_file_hash(file_path: Path) -> str:
-    """Calculate SHA-256 hash of a file"""
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+async def stream_upload_to_disk(upload: UploadFile, dest: Path) -> Tuple[int, str]:
+    """Stream an upload to dest in chunks and return its size and SHA-256 hash"""
+    # Written beside dest and swapped in at the end, so a rejected upload keeps the previous content
+    partial = dest.with_name(dest.name + '.part')
     sha256_hash = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
-    return sha256_hash.hexdigest()
+    file_size = 0
+    try:
+        async with aiofiles.open(partial, "wb") as buffer:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                file_size += len(chunk)
+                if file_size > MAX_FILE_SIZE:
+                    raise HTTPException(status_code=400, detail=f"File size exceeds {MAX_FILE_SIZE / (1024*1024)} MB limit")
+                sha256_hash.update(chunk)
+                await buffer.write(chunk)
+        os.replace(partial, dest)
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    return file_size, sha256_hash.hexdigest()
+
+def remove_physical_file(physical_path: Path) -> None:
+    """Delete a stored file and its directory if left empty, logging instead of raising on failure"""
+    if physical_path.exists() and physical_path.is_file():
+        try:
+            physical_path.unlink()
+            # Also try to remove parent directory if empty
+            parent_dir = physical_path.parent
+            if parent_dir.exists() and not any(parent_dir.iterdir()):
+                parent_dir.rmdir()
+        except Exception as e:
+            print(f"Warning: Could not delete physical file {physical_path}: {e}")
 
 def detect_mime_type(filename: str, content_type: Optional[str] = None) -> str:
     """Detect MIME type from filename and content type"""
@@ -523,18 +557,9 @@ async def delete_file(file_id: str, current_user: Dict = Depends(get_current_use
     # Delete from database (CASCADE will handle children)
     db.execute_update("DELETE FROM files WHERE id = %s", (file_id,))
     
-    # Delete physical file if exists
+    # Delete physical file if exists (off the event loop; a failure only leaves an orphan on disk)
     if file_path:
-        physical_path = Path(file_path)
-        if physical_path.exists() and physical_path.is_file():
-            try:
-                physical_path.unlink()
-                # Also try to remove parent directory if empty
-                parent_dir = physical_path.parent
-                if parent_dir.exists() and not any(parent_dir.iterdir()):
-                    parent_dir.rmdir()
-            except Exception as e:
-                print(f"Warning: Could not delete physical file {physical_path}: {e}")
+        await asyncio.to_thread(remove_physical_file, Path(file_path))
     
     # Log activity
     log_file_activity(user_id, workspace_id, file_id, 'delete', file_info['name'], file_info['name'])
@@ -576,23 +601,12 @@ async def upload_file_content(
     if not file.filename:
         raise HTTPException(status_code=400, detail="File name is required")
     
-    # Validate file size
-    file_content = await file.read()
-    file_size = len(file_content)
-    
-    if file_size > MAX_FILE_SIZE:
-        raise HTTPException(status_code=400, detail=f"File size exceeds {MAX_FILE_SIZE / (1024*1024)} MB limit")
-    
     # Build file path
     original_name = os.path.basename(file.filename)
     file_path = build_file_path(file_id, original_name)
     
-    # Save file
-    with open(file_path, "wb") as buffer:
-        buffer.write(file_content)
-    
-    # Calculate hash
-    file_hash = calculate_file_hash(file_path)
+    # Save file (size limit and hash are checked while streaming)
+    file_size, file_hash = await stream_upload_to_disk(file, file_path)
     
     # Detect MIME type
     mime_type = detect_mime_type(original_name, file.content_type)
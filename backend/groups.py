@@ -3,6 +3,7 @@ from pydantic import BaseModel
 from typing import Optional, List, Dict
 from database import db
 from auth import get_current_user
+from permission_cache import invalidate_permissions
 import uuid
 
 def require_admin(user: Dict):
@@ -125,6 +126,8 @@ async def delete_group(group_id: str, request: Request, user: Dict = Depends(get
         if affected == 0:
             raise HTTPException(status_code=404, detail="Group not found")
         
+        invalidate_permissions()
+        
         return {"success": True, "message": "Group deleted"}
     except HTTPException:
         raise
@@ -174,6 +177,7 @@ async def add_user_to_group(group_id: str, data: GroupUserAdd, request: Request,
             ON DUPLICATE KEY UPDATE user_id=user_id
         """
         db.execute_update(query, (data.user_id, group_id))
+        invalidate_permissions(user_id=data.user_id)
         
         return {"success": True, "message": "User added to group"}
     except HTTPException:
@@ -200,6 +204,8 @@ async def remove_user_from_group(group_id: str, user_id: int, request: Request,
         if affected == 0:
             raise HTTPException(status_code=404, detail="User not in group")
         
+        invalidate_permissions(user_id=user_id)
+        
         return {"success": True, "message": "User removed from group"}
     except HTTPException:
         raise
@@ -253,6 +259,7 @@ async def add_workspace_to_group(group_id: str, data: GroupWorkspacePermission,
             ON DUPLICATE KEY UPDATE permission_level = %s
         """
         db.execute_update(query, (group_id, data.workspace_id, data.permission_level, data.permission_level))
+        invalidate_permissions(workspace_id=data.workspace_id)
         
         return {"success": True, "message": "Workspace access granted to group"}
     except HTTPException:
@@ -285,6 +292,8 @@ async def update_group_workspace_permission(
         if affected == 0:
             raise HTTPException(status_code=404, detail="Permission not found")
         
+        invalidate_permissions(workspace_id=workspace_id)
+        
         return {"success": True, "message": "Permission updated"}
     except HTTPException:
         raise
@@ -302,6 +311,8 @@ async def remove_workspace_from_group(group_id: str, workspace_id: str, request:
         if affected == 0:
             raise HTTPException(status_code=404, detail="Permission not found")
         
+        invalidate_permissions(workspace_id=workspace_id)
+        
         return {"success": True, "message": "Workspace access revoked from group"}
     except HTTPException:
         raise
@@ -1,5 +1,6 @@
 from fastapi import FastAPI, HTTPException, File, UploadFile, Depends, Request, Cookie, Body
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
@@ -11,6 +12,7 @@ import collaborative
 from dotenv import load_dotenv
 import uuid
 from datetime import datetime, timedelta
+from collections import deque
 from database import db
 import sys
 import shutil
@@ -31,7 +33,7 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 
 # FastAPI app
-app = FastAPI(title="MarkD Documentation Manager API")
+app = FastAPI(title="MarkD Documentation Manager API", default_response_class=ORJSONResponse)
 
 # CORS configuration
 app.add_middleware(
@@ -63,11 +65,11 @@ from schemas import router as schemas_router
 app.include_router(schemas_router)
 
 # Include tasks router (simple version)
-from tasks_simple import router as tasks_router
+from tasks_simple import router as tasks_router, invalidate_task_tree_cache
 app.include_router(tasks_router)
 
 # Include settings router
-from settings import router as settings_router
+from settings import router as settings_router, check_settings_table
 app.include_router(settings_router)
 
 # Include admin routes (activity logs)
@@ -148,43 +150,8 @@ class PermissionBase(BaseModel):
 # Import get_current_user from auth to avoid circular imports
 from auth import get_current_user
 
-async def check_workspace_permission(workspace_id: str, user: Dict, required_level: str = 'read') -> str:
-    """Check user permission for a workspace via groups. Returns permission level if authorized."""
-    # Admins have full access to everything
-    if user.get('role') == 'admin':
-        return 'admin'
-
-    # Get all groups the user belongs to and their permissions for this workspace
-    query = """
-        SELECT MAX(
-            CASE gwp.permission_level
-                WHEN 'admin' THEN 3
-                WHEN 'write' THEN 2
-                WHEN 'read' THEN 1
-                ELSE 0
-            END
-        ) as max_level,
-        gwp.permission_level
-        FROM user_groups ug
-        JOIN group_workspace_permissions gwp ON ug.group_id = gwp.group_id
-        WHERE ug.user_id = %s AND gwp.workspace_id = %s
-        GROUP BY gwp.workspace_id
-        ORDER BY max_level DESC
-        LIMIT 1
-    """
-    permissions = db.execute_query(query, (user['id'], workspace_id))
-    
-    if not permissions or permissions[0]['max_level'] == 0:
-        raise HTTPException(status_code=403, detail="Access denied to this workspace")
-
-    user_level = permissions[0]['permission_level']
-    
-    # Check if user has required permission level
-    level_map = {'read': 1, 'write': 2, 'admin': 3}
-    if level_map.get(user_level, 0) < level_map.get(required_level, 0):
-        raise HTTPException(status_code=403, detail=f"Insufficient permissions. Requires '{required_level}' level.")
-
-    return user_level
+# Workspace permission check shared with the tasks router (cached per user and workspace)
+from tasks_simple import check_workspace_permission
 
 async def get_user_workspaces(user: Dict) -> List[str]:
     """Get list of workspace IDs the user has access to via groups"""
@@ -345,51 +312,57 @@ def update_document_tags(document_id: str, tag_names: List[str]) -> List[Dict[st
     return desired_tags
 
 def build_tree(parent_id: Optional[str] = 'root', workspace_id: str = 'demo', depth: int = 0) -> List[Dict]:
-    """Build document tree recursively with depth limit"""
+    """Build document tree from one workspace query, walking it iteratively with depth limit"""
     # Prevent infinite recursion
     if depth > 20:
         return []
     
-    # For root level, get all documents with parent_id = 'root' in the specified workspace
-    # Don't include root itself
+    # Fetch the whole workspace (with locks) once and index it by parent,
+    # instead of one query per folder and one lock query per document
     query = """
-        SELECT id, name, type, content, parent_id, created_at, updated_at, workspace_id
-        FROM documents
-        WHERE parent_id = %s AND id != 'root' AND workspace_id = %s
-        ORDER BY type DESC, name ASC
-        LIMIT 200
+        SELECT d.id, d.name, d.type, d.content, d.parent_id, d.created_at, d.updated_at, d.workspace_id,
+               l.user_id AS lock_user_id, l.user_name AS lock_user_name, l.locked_at AS lock_locked_at
+        FROM documents d
+        LEFT JOIN document_locks l ON l.document_id = d.id
+        WHERE d.workspace_id = %s AND d.id != 'root'
+        ORDER BY d.type DESC, d.name ASC
     """
-    documents = db.execute_query(query, (parent_id, workspace_id))
+    children_by_parent: Dict[Optional[str], List[Dict]] = {}
+    for doc in db.execute_query(query, (workspace_id,)):
+        children_by_parent.setdefault(doc['parent_id'], []).append(doc)
     
-    result = []
-    for doc in documents:
-        doc_dict = dict(doc)
-        
-        # Convert datetime objects to ISO format strings
-        if doc_dict.get('created_at'):
-            doc_dict['created_at'] = doc_dict['created_at'].isoformat()
-        if doc_dict.get('updated_at'):
-            doc_dict['updated_at'] = doc_dict['updated_at'].isoformat()
-        
-        # Check if document is locked
-        lock_query = "SELECT user_id, user_name, locked_at FROM document_locks WHERE document_id = %s"
-        locks = db.execute_query(lock_query, (doc['id'],))
-        if locks:
-            lb = dict(locks[0])
-            if lb.get('locked_at'):
-                try:
-                    lb['locked_at'] = lb['locked_at'].isoformat()
-                except Exception:
-                    pass
-            doc_dict['locked_by'] = lb
-        else:
-            doc_dict['locked_by'] = None
-        
-        # If folder, get children recursively with depth tracking
-        if doc['type'] == 'folder':
-            doc_dict['children'] = build_tree(doc['id'], workspace_id, depth + 1)
-        
-        result.append(doc_dict)
+    result: List[Dict] = []
+    pending = deque([(parent_id, depth, result)])
+    while pending:
+        current_parent, current_depth, siblings = pending.popleft()
+        for doc in children_by_parent.get(current_parent, [])[:200]:
+            doc_dict = dict(doc)
+            
+            # Convert datetime objects to ISO format strings
+            if doc_dict.get('created_at'):
+                doc_dict['created_at'] = doc_dict['created_at'].isoformat()
+            if doc_dict.get('updated_at'):
+                doc_dict['updated_at'] = doc_dict['updated_at'].isoformat()
+            
+            lock_user_id = doc_dict.pop('lock_user_id')
+            lock_user_name = doc_dict.pop('lock_user_name')
+            lock_locked_at = doc_dict.pop('lock_locked_at')
+            if lock_user_name is not None:
+                doc_dict['locked_by'] = {
+                    'user_id': lock_user_id,
+                    'user_name': lock_user_name,
+                    'locked_at': lock_locked_at.isoformat() if lock_locked_at else None,
+                }
+            else:
+                doc_dict['locked_by'] = None
+            
+            # If folder, queue its children with depth tracking
+            if doc['type'] == 'folder':
+                doc_dict['children'] = []
+                if current_depth + 1 <= 20:
+                    pending.append((doc['id'], current_depth + 1, doc_dict['children']))
+            
+            siblings.append(doc_dict)
     
     return result
 
@@ -819,6 +792,18 @@ async def startup_event():
     """Initialize default workspace and permissions on startup"""
     ensure_default_setup()
     
+    if check_settings_table():
+        print("✓ System settings table available")
+    else:
+        print("⚠ Warning: system_settings table unavailable, serving default settings")
+    
+    # Pre-open pooled database connections
+    try:
+        await asyncio.to_thread(db.warm_pool)
+        print(f"✓ Database pool warmed ({db.pool_size} connections)")
+    except Exception as e:
+        print(f"⚠ Warning: Could not warm database pool: {e}")
+    
     # Start background task for cleaning stale presence
     asyncio.create_task(start_presence_cleanup_task())
 
@@ -1576,6 +1561,20 @@ ALLOWED_UPLOAD_EXTENSIONS = {
     '.zip', '.tar', '.gz', '.rar', '.7z',
 }
 
+UPLOAD_COPY_CHUNK = 8 * 1024 * 1024
+MAX_UPLOAD_SIZE = 50 * 1024 * 1024  # 50 MB
+
+def save_upload(src, dest: Path) -> int:
+    """Copy a spooled upload to dest with one buffered copy loop and return its size"""
+    # The spooled upload already knows its length: reject oversized files before writing anything
+    size = src.seek(0, os.SEEK_END)
+    if size > MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=400, detail=f"File exceeds the {MAX_UPLOAD_SIZE // (1024 * 1024)} MB limit")
+    src.seek(0)
+    with dest.open("wb") as dst:
+        shutil.copyfileobj(src, dst, UPLOAD_COPY_CHUNK)
+    return size
+
 @app.post("/api/upload-image")
 async def upload_image(file: UploadFile = File(...)):
     """Upload an image or document file and return its URL"""
@@ -1599,8 +1598,7 @@ async def upload_image(file: UploadFile = File(...)):
         print(f"Saving file to: {file_path}")
         
         # Save file
-        with file_path.open("wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        await asyncio.to_thread(save_upload, file.file, file_path)
         
         print(f"File saved successfully: {unique_filename}")
         
@@ -2188,6 +2186,7 @@ async def disconnect(sid):
             "DELETE FROM task_locks WHERE locked_at < %s",
             (cutoff_time,)
         )
+        invalidate_task_tree_cache()
         
         # Clean up expired password locks
         db.execute_update(
@@ -0,0 +1,27 @@
+-- Migration 032: Unique key on schema connection endpoints
+-- Turns the create_connection duplicate check into a point lookup and lets the database enforce it
+
+-- Drop existing duplicates, keeping one row per endpoint pair
+DELETE sc1 FROM schema_connections sc1
+JOIN schema_connections sc2
+  ON sc1.schema_id = sc2.schema_id
+ AND sc1.from_device_id = sc2.from_device_id
+ AND sc1.from_port = sc2.from_port
+ AND sc1.to_device_id = sc2.to_device_id
+ AND sc1.to_port = sc2.to_port
+ AND sc1.id > sc2.id;
+
+SET @sql = (SELECT IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+     WHERE table_schema = DATABASE()
+     AND table_name = 'schema_connections'
+     AND index_name = 'uq_schema_connection_endpoints') = 0,
+    'ALTER TABLE schema_connections ADD UNIQUE KEY uq_schema_connection_endpoints (schema_id, from_device_id, from_port, to_device_id, to_port)',
+    'SELECT "Index uq_schema_connection_endpoints already exists"'
+));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+-- schema_devices needs no (schema_id, id) key: InnoDB secondary indexes carry the primary key,
+-- so idx_schema already covers "WHERE id = ? AND schema_id = ?" and "WHERE schema_id = ?".
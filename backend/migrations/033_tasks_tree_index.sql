@@ -0,0 +1,16 @@
+-- Migration 033: Covering index for the task tree walk
+-- build_task_tree's recursive CTE looks children up by (parent_id, workspace_id) and reads only id and type,
+-- so this index lets every step of the walk stay inside the index (EXPLAIN shows "Using index" on tasks).
+-- task_assignees and task_tag_links already have (task_id, ...) primary keys for the per-task aggregates.
+
+SET @sql = (SELECT IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+     WHERE table_schema = DATABASE()
+     AND table_name = 'tasks'
+     AND index_name = 'idx_tasks_parent_workspace_type') = 0,
+    'CREATE INDEX idx_tasks_parent_workspace_type ON tasks(parent_id, workspace_id, type)',
+    'SELECT "Index idx_tasks_parent_workspace_type already exists"'
+));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,41 @@
+-- Migration 034: (task_id, timestamp) indexes for the task activity feeds
+-- The timeline, comment and attachment lists filter by task_id and sort by their timestamp; with only
+-- single-column task_id indexes every call ended in a filesort. The composite keys return the rows in order.
+-- tasks(parent_id, workspace_id, type) comes from 033, task_locks/task_assignees/task_tag_links are keyed
+-- by task_id already, and tags.name is unique under a case-insensitive collation, so no LOWER(name) index.
+
+SET @sql = (SELECT IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+     WHERE table_schema = DATABASE()
+     AND table_name = 'task_timeline'
+     AND index_name = 'idx_task_timeline_task_created') = 0,
+    'CREATE INDEX idx_task_timeline_task_created ON task_timeline(task_id, created_at)',
+    'SELECT "Index idx_task_timeline_task_created already exists"'
+));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @sql = (SELECT IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+     WHERE table_schema = DATABASE()
+     AND table_name = 'task_comments'
+     AND index_name = 'idx_task_comments_task_created') = 0,
+    'CREATE INDEX idx_task_comments_task_created ON task_comments(task_id, created_at)',
+    'SELECT "Index idx_task_comments_task_created already exists"'
+));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
+
+SET @sql = (SELECT IF(
+    (SELECT COUNT(*) FROM information_schema.statistics
+     WHERE table_schema = DATABASE()
+     AND table_name = 'task_files'
+     AND index_name = 'idx_task_files_task_uploaded') = 0,
+    'CREATE INDEX idx_task_files_task_uploaded ON task_files(task_id, uploaded_at)',
+    'SELECT "Index idx_task_files_task_uploaded already exists"'
+));
+PREPARE stmt FROM @sql;
+EXECUTE stmt;
+DEALLOCATE PREPARE stmt;
@@ -0,0 +1,48 @@
+# Shared workspace permission cache for all modules
+# Permission levels change rarely (group/role administration) but are resolved on every request,
+# so resolved levels are kept for a short TTL and dropped whenever permissions are edited.
+
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+PERMISSION_CACHE_TTL = 30  # seconds
+PERMISSION_CACHE_MAX_ENTRIES = 8192
+
+_cache: Dict[Tuple, Tuple[float, str]] = {}
+_lock = threading.Lock()
+
+def get_cached_permission(scope: str, user_id: int, workspace_id: str, loader: Callable[[], str]) -> str:
+    """Return the cached permission for (scope, user, workspace), calling loader on a miss"""
+    key = (scope, user_id, workspace_id)
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(key)
+        if entry and entry[0] > now:
+            return entry[1]
+
+    permission = loader()
+
+    with _lock:
+        if len(_cache) >= PERMISSION_CACHE_MAX_ENTRIES:
+            # Drop expired entries first, then everything if still full
+            for k in [k for k, (expires, _) in _cache.items() if expires <= now]:
+                del _cache[k]
+            if len(_cache) >= PERMISSION_CACHE_MAX_ENTRIES:
+                _cache.clear()
+        _cache[key] = (now + PERMISSION_CACHE_TTL, permission)
+    return permission
+
+def invalidate_permissions(workspace_id: Optional[str] = None, user_id: Optional[int] = None):
+    """Forget cached permissions for a workspace and/or user (all of them if neither is given)"""
+    with _lock:
+        if workspace_id is None and user_id is None:
+            _cache.clear()
+            return
+        for key in list(_cache):
+            _, cached_user_id, cached_workspace_id = key
+            if workspace_id is not None and cached_workspace_id != workspace_id:
+                continue
+            if user_id is not None and str(cached_user_id) != str(user_id):
+                continue
+            del _cache[key]
@@ -1,12 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Header, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, List, Any
-from database import db
+from typing import Any, Callable, Dict, List, Optional
+from database import db, build_update_sql
 from websocket_broadcasts import broadcast_schema_tree_update, broadcast_schema_lock_update, broadcast_schema_content_updated
 from schema_device_templates import get_device_templates, get_template_by_type
+from permission_cache import get_cached_permission
+import asyncio
+import time
+from functools import lru_cache
 import uuid
 from datetime import datetime, timedelta
-import json
+import orjson
+import pymysql
 
 router = APIRouter()
 
@@ -16,6 +22,99 @@ LOCK_TIMEOUT_MINUTES = 30
 # Import get_current_user from auth
 from auth import get_current_user
 
+# ===== SQL =====
+# Hot statements are kept as module constants so every call sends identical text
+
+DEVICE_SELECT_SQL = """
+    SELECT id, schema_id, device_type, name, model, ip_address, mac_address,
+           position_x, position_y, config_json, created_at, updated_at
+    FROM schema_devices
+"""
+DEVICE_BY_ID_SQL = DEVICE_SELECT_SQL + "WHERE id = %s"
+DEVICES_BY_SCHEMA_SQL = DEVICE_SELECT_SQL + "WHERE schema_id = %s"
+
+MAX_CONNECTION_BATCH = 500
+
+# Columns a client may ask to have echoed back via the X-Fields header
+DEVICE_FIELDS = (
+    'schema_id', 'device_type', 'name', 'model', 'ip_address', 'mac_address',
+    'position_x', 'position_y', 'config_json', 'created_at',
+)
+
+@lru_cache(maxsize=256)
+def device_fields_sql(fields: tuple) -> str:
+    """Build a by-id device SELECT returning id, updated_at and the given fields"""
+    return f"SELECT {', '.join(('id', 'updated_at') + fields)} FROM schema_devices WHERE id = %s"
+
+def parse_device_fields(header: Optional[str]) -> Optional[tuple]:
+    """Parse an X-Fields header into allowlisted device columns (None when absent)"""
+    if header is None:
+        return None
+    requested = {field.strip() for field in header.split(',')}
+    return tuple(field for field in DEVICE_FIELDS if field in requested)
+
+CONNECTION_SELECT_SQL = """
+    SELECT id, schema_id, from_device_id, from_port, to_device_id, to_port,
+           connection_type, bandwidth, vlan_id, config_json, created_at, updated_at
+    FROM schema_connections
+"""
+CONNECTION_BY_ID_SQL = CONNECTION_SELECT_SQL + "WHERE id = %s"
+CONNECTIONS_BY_SCHEMA_SQL = CONNECTION_SELECT_SQL + "WHERE schema_id = %s"
+
+CONNECTION_INSERT_SQL = """
+    INSERT INTO schema_connections
+    (id, schema_id, from_device_id, from_port, to_device_id, to_port,
+     connection_type, bandwidth, vlan_id, config_json)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+TEMPLATE_BY_ID_SQL = """
+    SELECT id, device_type, name, description, default_ports, icon_svg, default_size, created_by, created_at, updated_at
+    FROM schema_device_templates WHERE id = %s
+"""
+
+# Partial updates: a NULL parameter keeps the current column value
+DEVICE_UPDATE_SQL = """
+    UPDATE schema_devices SET
+        name = COALESCE(%s, name),
+        position_x = COALESCE(%s, position_x),
+        position_y = COALESCE(%s, position_y),
+        model = COALESCE(%s, model),
+        ip_address = COALESCE(%s, ip_address),
+        mac_address = COALESCE(%s, mac_address),
+        config_json = COALESCE(%s, config_json),
+        updated_at = %s
+    WHERE id = %s
+"""
+
+CONNECTION_UPDATE_SQL = """
+    UPDATE schema_connections SET
+        connection_type = COALESCE(%s, connection_type),
+        bandwidth = COALESCE(%s, bandwidth),
+        vlan_id = COALESCE(%s, vlan_id),
+        config_json = COALESCE(%s, config_json),
+        updated_at = %s
+    WHERE id = %s
+"""
+
+TEMPLATE_UPDATE_SQL = """
+    UPDATE schema_device_templates SET
+        name = COALESCE(%s, name),
+        description = COALESCE(%s, description),
+        default_ports = COALESCE(%s, default_ports),
+        icon_svg = COALESCE(%s, icon_svg),
+        default_size = COALESCE(%s, default_size)
+    WHERE id = %s AND workspace_id = %s
+"""
+
+def _dumps_or_none(value):
+    """Serialize a JSON column value, passing None through for COALESCE updates"""
+    return orjson.dumps(value).decode() if value is not None else None
+
+def is_duplicate_key(error: pymysql.err.IntegrityError) -> bool:
+    """Whether an IntegrityError is a unique-key violation (ER_DUP_ENTRY)"""
+    return bool(error.args) and error.args[0] == 1062
+
 # ===== Helper Functions =====
 
 def get_workspace_permission_sync(user_id: int, workspace_id: str, user_role: str = None) -> str:
@@ -24,6 +123,11 @@ def get_workspace_permission_sync(user_id: int, workspace_id: str, user_role: st
     if user_role == 'admin':
         return 'admin'
     
+    return get_cached_permission('schemas', user_id, workspace_id,
+                                 lambda: load_workspace_permission(user_id, workspace_id))
+
+def load_workspace_permission(user_id: int, workspace_id: str) -> str:
+    """Resolve user permission for workspace from the database"""
     # Also check in database if role not provided
     user_query = "SELECT role FROM users WHERE id = %s"
     user_result = db.execute_query(user_query, (user_id,))
@@ -47,12 +151,98 @@ def get_workspace_permission_sync(user_id: int, workspace_id: str, user_role: st
     """
     result = db.execute_query(query, (workspace_id, user_id))
     level = result[0]['max_level'] if result else 0
-    
+    return permission_from_level(level)
+
+# Inline permission level (3=admin, 2=write, 1=read, 0=none) of a user on `s.workspace_id`.
+# Lets endpoints fetch existence, workspace and permission in a single query.
+# Takes the user id twice as parameters.
+PERMISSION_LEVEL_SQL = """
+    CASE WHEN EXISTS (SELECT 1 FROM users u WHERE u.id = %s AND u.role = 'admin') THEN 3
+    ELSE (
+        SELECT COALESCE(MAX(
+            CASE gwp.permission_level
+                WHEN 'admin' THEN 3
+                WHEN 'write' THEN 2
+                WHEN 'read' THEN 1
+                ELSE 0
+            END
+        ), 0)
+        FROM user_groups ug
+        JOIN group_workspace_permissions gwp ON ug.group_id = gwp.group_id
+        WHERE ug.user_id = %s AND gwp.workspace_id = s.workspace_id
+    ) END
+"""
+
+def permission_from_level(level: Optional[int], user_role: str = None) -> str:
+    """Map a numeric permission level to its name. Admins always have 'admin' permission."""
+    if user_role == 'admin':
+        return 'admin'
+    level = level or 0
     if level >= 3: return 'admin'
     if level >= 2: return 'write'
     if level >= 1: return 'read'
     return 'none'
 
+def _loads_json(value: Any) -> Any:
+    """Decode a JSON column returned as a string"""
+    return orjson.loads(value) if isinstance(value, str) else value
+
+def _loads_json_or_empty(value: Any) -> Any:
+    """Decode a JSON column, falling back to an empty dict on invalid data"""
+    try:
+        return _loads_json(value)
+    except orjson.JSONDecodeError:
+        return {}
+
+# Per-column post-processing applied to DB rows before they are returned.
+# Datetimes are left as-is: the ORJSON response encoder writes them as ISO-8601.
+DEVICE_COLUMNS = (('config_json', _loads_json_or_empty),)
+CONNECTION_COLUMNS = DEVICE_COLUMNS
+TEMPLATE_COLUMNS = (('default_ports', _loads_json), ('default_size', _loads_json))
+
+def make_row_shaper(columns: tuple) -> Callable[[Dict], Dict]:
+    """Compile a row shaper for the given column transforms, unrolled with no per-row loop"""
+    lines = ["def shape(row):", "    row = dict(row)"]
+    namespace = {}
+    for index, (key, transform) in enumerate(columns):
+        namespace[f"transform_{index}"] = transform
+        lines.append(f"    value = row.get({key!r})")
+        lines.append(f"    if value: row[{key!r}] = transform_{index}(value)")
+    lines.append("    return row")
+    exec("\n".join(lines), namespace)
+    return namespace['shape']
+
+shape_device = make_row_shaper(DEVICE_COLUMNS)
+shape_connection = make_row_shaper(CONNECTION_COLUMNS)
+shape_template = make_row_shaper(TEMPLATE_COLUMNS)
+
+# schema_id -> (expires_at, {'workspace_id', 'type'}). Both fields are fixed at creation,
+# so entries only need dropping when schemas are deleted.
+SCHEMA_META_TTL = 600  # seconds
+SCHEMA_META_MAX_ENTRIES = 16384
+_schema_meta_cache: Dict[str, tuple] = {}
+
+async def get_schema_meta(schema_id: str) -> Optional[Dict[str, Any]]:
+    """Get workspace_id and type of a schema, cached in-process"""
+    entry = _schema_meta_cache.get(schema_id)
+    now = time.monotonic()
+    if entry and entry[0] > now:
+        return entry[1]
+    
+    result = await db.fetch("SELECT workspace_id, type FROM `schemas` WHERE id = %s", (schema_id,))
+    if not result:
+        return None
+    
+    if len(_schema_meta_cache) >= SCHEMA_META_MAX_ENTRIES:
+        _schema_meta_cache.clear()
+    meta = dict(result[0])
+    _schema_meta_cache[schema_id] = (now + SCHEMA_META_TTL, meta)
+    return meta
+
+def forget_schema_meta():
+    """Drop cached schema metadata (deleting a folder also deletes its children)"""
+    _schema_meta_cache.clear()
+
 def build_schemas_tree(parent_id: Optional[str] = None, workspace_id: str = 'demo', depth: int = 0) -> List[Dict]:
     """Build schemas tree recursively with depth limit"""
     # Prevent infinite recursion
@@ -99,7 +289,7 @@ def build_schemas_tree(parent_id: Optional[str] = None, workspace_id: str = 'dem
                 item_dict['locked_by'] = {
                     'user_id': str(item_dict['locked_user_id']),
                     'user_name': item_dict['locked_user_name'],
-                    'locked_at': locked_at.isoformat() if locked_at else None
+                    'locked_at': locked_at
                 }
         else:
             item_dict['locked_by'] = None
@@ -109,14 +299,6 @@ def build_schemas_tree(parent_id: Optional[str] = None, workspace_id: str = 'dem
         item_dict.pop('locked_user_name', None)
         item_dict.pop('locked_at', None)
 
-        # Convert datetime objects to ISO format strings
-        if item_dict.get('created_at'):
-            if isinstance(item_dict['created_at'], datetime):
-                item_dict['created_at'] = item_dict['created_at'].isoformat()
-        if item_dict.get('updated_at'):
-            if isinstance(item_dict['updated_at'], datetime):
-                item_dict['updated_at'] = item_dict['updated_at'].isoformat()
-        
         # If folder, get children recursively with depth tracking
         if item_dict.get('type') == 'folder':
             item_dict['children'] = build_schemas_tree(item['id'], workspace_id, depth + 1)
@@ -264,6 +446,9 @@ class ConnectionCreate(BaseModel):
     vlan_id: Optional[int] = None
     config_json: Optional[Dict[str, Any]] = None
 
+class ConnectionBatchCreate(BaseModel):
+    connections: List[ConnectionCreate]
+
 class ConnectionUpdate(BaseModel):
     connection_type: Optional[str] = None
     bandwidth: Optional[int] = None
@@ -292,7 +477,7 @@ async def get_device_templates_endpoint(workspace_id: str = Query('demo'), curre
         FROM schema_device_templates
         WHERE workspace_id = %s
     """
-    custom_results = db.execute_query(custom_query, (workspace_id,))
+    custom_results = await db.fetch(custom_query, (workspace_id,))
     
     custom_templates = []
     for row in custom_results:
@@ -300,9 +485,9 @@ async def get_device_templates_endpoint(workspace_id: str = Query('demo'), curre
             'device_type': row['device_type'],
             'name': row['name'],
             'description': row.get('description', ''),
-            'default_ports': json.loads(row['default_ports']) if isinstance(row['default_ports'], str) else row['default_ports'],
+            'default_ports': _loads_json(row['default_ports']),
             'icon_svg': row.get('icon_svg', ''),
-            'default_size': json.loads(row['default_size']) if isinstance(row['default_size'], str) else row['default_size'],
+            'default_size': _loads_json(row['default_size']),
             'is_custom': True,
             'template_id': row['id']
         }
@@ -319,16 +504,16 @@ async def get_schemas_tree(workspace_id: str = Query('demo'), current_user: Dict
     try:
         user_id = current_user['id']
         user_role = current_user.get('role')
-        permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+        permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, workspace_id, user_role)
         
         if permission == 'none':
             raise HTTPException(status_code=403, detail="Access denied")
         
-        tree = build_schemas_tree(None, workspace_id)
+        tree = await asyncio.to_thread(build_schemas_tree, None, workspace_id)
         
         # Get workspace info
         ws_query = "SELECT name FROM workspaces WHERE id = %s"
-        ws = db.execute_query(ws_query, (workspace_id,))
+        ws = await db.fetch(ws_query, (workspace_id,))
         workspace_name = ws[0]['name'] if ws else 'Schemas'
         
         return {"success": True, "tree": tree or [], "workspace_name": workspace_name}
@@ -345,7 +530,7 @@ async def create_schema(data: SchemaCreate, current_user: Dict = Depends(get_cur
     """Create schema or folder (requires write or admin)"""
     user_id = current_user['id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, data.workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, data.workspace_id, user_role)
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
@@ -361,7 +546,7 @@ async def create_schema(data: SchemaCreate, current_user: Dict = Depends(get_cur
     # Validate parent if provided
     if data.parent_id:
         parent_query = "SELECT id, type, workspace_id FROM `schemas` WHERE id = %s"
-        parent_result = db.execute_query(parent_query, (data.parent_id,))
+        parent_result = await db.fetch(parent_query, (data.parent_id,))
         if not parent_result:
             raise HTTPException(status_code=404, detail="Parent not found")
         if parent_result[0]['type'] != 'folder':
@@ -377,7 +562,7 @@ async def create_schema(data: SchemaCreate, current_user: Dict = Depends(get_cur
         (id, workspace_id, parent_id, type, name, description, created_by)
         VALUES (%s, %s, %s, %s, %s, %s, %s)
     """
-    db.execute_update(query, (
+    await db.execute(query, (
         schema_id, data.workspace_id, data.parent_id, data.type, name, data.description, user_id
     ))
     
@@ -387,7 +572,7 @@ async def create_schema(data: SchemaCreate, current_user: Dict = Depends(get_cur
         item_path = name
     
     # Log activity
-    log_schema_activity(user_id, data.workspace_id, schema_id, 'create', item_path, name)
+    await asyncio.to_thread(log_schema_activity, user_id, data.workspace_id, schema_id, 'create', item_path, name)
     
     # Broadcast tree update to all clients
     await broadcast_schema_tree_update()
@@ -397,17 +582,9 @@ async def create_schema(data: SchemaCreate, current_user: Dict = Depends(get_cur
         SELECT id, name, type, parent_id, description, created_at, updated_at, workspace_id
         FROM `schemas` WHERE id = %s
     """
-    schema_result = db.execute_query(get_query, (schema_id,))
+    schema_result = await db.fetch(get_query, (schema_id,))
     schema_item = dict(schema_result[0]) if schema_result else {}
     
-    # Convert datetime objects
-    if schema_item.get('created_at'):
-        if isinstance(schema_item['created_at'], datetime):
-            schema_item['created_at'] = schema_item['created_at'].isoformat()
-    if schema_item.get('updated_at'):
-        if isinstance(schema_item['updated_at'], datetime):
-            schema_item['updated_at'] = schema_item['updated_at'].isoformat()
-    
     return {"success": True, "schema": schema_item}
 
 # GET
@@ -419,7 +596,7 @@ async def get_schema(schema_id: str, current_user: Dict = Depends(get_current_us
             SELECT id, name, type, parent_id, description, created_at, updated_at, workspace_id, created_by
             FROM `schemas` WHERE id = %s
         """
-        result = db.execute_query(query, (schema_id,))
+        result = await db.fetch(query, (schema_id,))
         
         if not result:
             raise HTTPException(status_code=404, detail="Schema not found")
@@ -427,68 +604,18 @@ async def get_schema(schema_id: str, current_user: Dict = Depends(get_current_us
         schema_item = dict(result[0])
         user_id = current_user['id']
         user_role = current_user.get('role')
-        permission = get_workspace_permission_sync(user_id, schema_item['workspace_id'], user_role)
+        permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, schema_item['workspace_id'], user_role)
         
         if permission == 'none':
             raise HTTPException(status_code=403, detail="Access denied")
         
-        # Convert datetime objects
-        if schema_item.get('created_at'):
-            if isinstance(schema_item['created_at'], datetime):
-                schema_item['created_at'] = schema_item['created_at'].isoformat()
-        if schema_item.get('updated_at'):
-            if isinstance(schema_item['updated_at'], datetime):
-                schema_item['updated_at'] = schema_item['updated_at'].isoformat()
-        
         # Get devices
-        devices_query = """
-            SELECT id, schema_id, device_type, name, model, ip_address, mac_address,
-                   position_x, position_y, config_json, created_at, updated_at
-            FROM schema_devices WHERE schema_id = %s
-        """
-        devices_result = db.execute_query(devices_query, (schema_id,))
-        devices = []
-        for device in devices_result:
-            device_dict = dict(device)
-            # Parse config_json if it's a string
-            if device_dict.get('config_json') and isinstance(device_dict['config_json'], str):
-                try:
-                    device_dict['config_json'] = json.loads(device_dict['config_json'])
-                except:
-                    device_dict['config_json'] = {}
-            # Convert datetime objects
-            if device_dict.get('created_at'):
-                if isinstance(device_dict['created_at'], datetime):
-                    device_dict['created_at'] = device_dict['created_at'].isoformat()
-            if device_dict.get('updated_at'):
-                if isinstance(device_dict['updated_at'], datetime):
-                    device_dict['updated_at'] = device_dict['updated_at'].isoformat()
-            devices.append(device_dict)
+        devices_result = await db.fetch(DEVICES_BY_SCHEMA_SQL, (schema_id,))
+        devices = [shape_device(device) for device in devices_result]
         
         # Get connections
-        connections_query = """
-            SELECT id, schema_id, from_device_id, from_port, to_device_id, to_port,
-                   connection_type, bandwidth, vlan_id, config_json, created_at, updated_at
-            FROM schema_connections WHERE schema_id = %s
-        """
-        connections_result = db.execute_query(connections_query, (schema_id,))
-        connections = []
-        for conn in connections_result:
-            conn_dict = dict(conn)
-            # Parse config_json if it's a string
-            if conn_dict.get('config_json') and isinstance(conn_dict['config_json'], str):
-                try:
-                    conn_dict['config_json'] = json.loads(conn_dict['config_json'])
-                except:
-                    conn_dict['config_json'] = {}
-            # Convert datetime objects
-            if conn_dict.get('created_at'):
-                if isinstance(conn_dict['created_at'], datetime):
-                    conn_dict['created_at'] = conn_dict['created_at'].isoformat()
-            if conn_dict.get('updated_at'):
-                if isinstance(conn_dict['updated_at'], datetime):
-                    conn_dict['updated_at'] = conn_dict['updated_at'].isoformat()
-            connections.append(conn_dict)
+        connections_result = await db.fetch(CONNECTIONS_BY_SCHEMA_SQL, (schema_id,))
+        connections = [shape_connection(conn) for conn in connections_result]
         
         schema_item['devices'] = devices
         schema_item['connections'] = connections
@@ -509,14 +636,14 @@ async def update_schema(schema_id: str, data: SchemaUpdate, current_user: Dict =
     
     # Get current schema
     get_query = "SELECT workspace_id, type, name FROM `schemas` WHERE id = %s"
-    schema_result = db.execute_query(get_query, (schema_id,))
+    schema_result = await db.fetch(get_query, (schema_id,))
     
     if not schema_result:
         raise HTTPException(status_code=404, detail="Schema not found")
     
     workspace_id = schema_result[0]['workspace_id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, workspace_id, user_role)
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
@@ -529,12 +656,12 @@ async def update_schema(schema_id: str, data: SchemaUpdate, current_user: Dict =
     if data.name is not None:
         if not data.name.strip():
             raise HTTPException(status_code=400, detail="Name cannot be empty")
-        updates.append("name = %s")
+        updates.append("name")
         params.append(data.name.strip())
         action = 'rename'
     
     if data.description is not None:
-        updates.append("description = %s")
+        updates.append("description")
         params.append(data.description)
         if not action:
             action = 'update'
@@ -543,7 +670,7 @@ async def update_schema(schema_id: str, data: SchemaUpdate, current_user: Dict =
         # Validate parent
         if data.parent_id:
             parent_query = "SELECT id, type, workspace_id FROM `schemas` WHERE id = %s"
-            parent_result = db.execute_query(parent_query, (data.parent_id,))
+            parent_result = await db.fetch(parent_query, (data.parent_id,))
             if not parent_result:
                 raise HTTPException(status_code=404, detail="Parent not found")
             if parent_result[0]['type'] != 'folder':
@@ -551,7 +678,7 @@ async def update_schema(schema_id: str, data: SchemaUpdate, current_user: Dict =
             if parent_result[0]['workspace_id'] != workspace_id:
                 raise HTTPException(status_code=400, detail="Parent must be in the same workspace")
         
-        updates.append("parent_id = %s")
+        updates.append("parent_id")
         params.append(data.parent_id)
         if action != 'rename':
             action = 'move'
@@ -560,16 +687,12 @@ async def update_schema(schema_id: str, data: SchemaUpdate, current_user: Dict =
         return {"success": True, "message": "No changes"}
     
     params.append(schema_id)
-    update_query = f"""
-        UPDATE `schemas` 
-        SET {', '.join(updates)}, updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
-    """
-    db.execute_update(update_query, tuple(params))
+    update_query = build_update_sql('`schemas`', tuple(updates), "id = %s", touch_updated_at=True)
+    await db.execute(update_query, tuple(params))
     
     # Log activity
     if action:
-        log_schema_activity(user_id, workspace_id, schema_id, action, schema_result[0]['name'], data.name or schema_result[0]['name'])
+        await asyncio.to_thread(log_schema_activity, user_id, workspace_id, schema_id, action, schema_result[0]['name'], data.name or schema_result[0]['name'])
     
     # Broadcast tree update
     await broadcast_schema_tree_update()
@@ -584,7 +707,7 @@ async def delete_schema(schema_id: str, current_user: Dict = Depends(get_current
     
     # Get schema info
     query = "SELECT id, workspace_id, type, name FROM `schemas` WHERE id = %s"
-    result = db.execute_query(query, (schema_id,))
+    result = await db.fetch(query, (schema_id,))
     
     if not result:
         raise HTTPException(status_code=404, detail="Schema not found")
@@ -592,23 +715,24 @@ async def delete_schema(schema_id: str, current_user: Dict = Depends(get_current
     schema_info = result[0]
     workspace_id = schema_info['workspace_id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, workspace_id, user_role)
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
     
     # Build path for activity log
     all_schemas_query = "SELECT id, name, parent_id FROM `schemas` WHERE workspace_id = %s"
-    all_schemas = db.execute_query(all_schemas_query, (workspace_id,))
+    all_schemas = await db.fetch(all_schemas_query, (workspace_id,))
     schemas_map = {s['id']: dict(s) for s in all_schemas}
     item_path = build_path(schema_id, schemas_map)
     
     # Delete (CASCADE will handle children, devices, connections, locks, tags, activity logs)
     delete_query = "DELETE FROM `schemas` WHERE id = %s"
-    db.execute_update(delete_query, (schema_id,))
+    await db.execute(delete_query, (schema_id,))
+    forget_schema_meta()
     
     # Log activity
-    log_schema_activity(user_id, workspace_id, schema_id, 'delete', item_path, schema_info['name'])
+    await asyncio.to_thread(log_schema_activity, user_id, workspace_id, schema_id, 'delete', item_path, schema_info['name'])
     
     # Broadcast tree update
     await broadcast_schema_tree_update()
@@ -624,63 +748,40 @@ async def get_schema_devices(schema_id: str, current_user: Dict = Depends(get_cu
     user_id = current_user['id']
     
     # Check schema exists and get workspace
-    schema_query = "SELECT workspace_id FROM `schemas` WHERE id = %s"
-    schema_result = db.execute_query(schema_query, (schema_id,))
-    if not schema_result:
+    schema_meta = await get_schema_meta(schema_id)
+    if not schema_meta:
         raise HTTPException(status_code=404, detail="Schema not found")
     
-    workspace_id = schema_result[0]['workspace_id']
+    workspace_id = schema_meta['workspace_id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, workspace_id, user_role)
     
     if permission == 'none':
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Get devices
-    devices_query = """
-        SELECT id, schema_id, device_type, name, model, ip_address, mac_address,
-               position_x, position_y, config_json, created_at, updated_at
-        FROM schema_devices WHERE schema_id = %s
-    """
-    devices_result = db.execute_query(devices_query, (schema_id,))
-    devices = []
-    for device in devices_result:
-        device_dict = dict(device)
-        # Parse config_json if it's a string
-        if device_dict.get('config_json') and isinstance(device_dict['config_json'], str):
-            try:
-                device_dict['config_json'] = json.loads(device_dict['config_json'])
-            except:
-                device_dict['config_json'] = {}
-        # Convert datetime objects
-        if device_dict.get('created_at'):
-            if isinstance(device_dict['created_at'], datetime):
-                device_dict['created_at'] = device_dict['created_at'].isoformat()
-        if device_dict.get('updated_at'):
-            if isinstance(device_dict['updated_at'], datetime):
-                device_dict['updated_at'] = device_dict['updated_at'].isoformat()
-        devices.append(device_dict)
+    devices_result = await db.fetch(DEVICES_BY_SCHEMA_SQL, (schema_id,))
+    devices = [shape_device(device) for device in devices_result]
     
     return {"success": True, "devices": devices}
 
 # CREATE DEVICE
 @router.post("/api/schemas/{schema_id}/devices")
-async def create_device(schema_id: str, data: DeviceCreate, current_user: Dict = Depends(get_current_user)):
+async def create_device(schema_id: str, data: DeviceCreate, background_tasks: BackgroundTasks, current_user: Dict = Depends(get_current_user)):
     """Create a device in a schema (requires write or admin)"""
     user_id = current_user['id']
     
     # Check schema exists and get workspace
-    schema_query = "SELECT workspace_id, type FROM `schemas` WHERE id = %s"
-    schema_result = db.execute_query(schema_query, (schema_id,))
-    if not schema_result:
+    schema_meta = await get_schema_meta(schema_id)
+    if not schema_meta:
         raise HTTPException(status_code=404, detail="Schema not found")
     
-    if schema_result[0]['type'] != 'schema':
+    if schema_meta['type'] != 'schema':
         raise HTTPException(status_code=400, detail="Can only add devices to schemas, not folders")
     
-    workspace_id = schema_result[0]['workspace_id']
+    workspace_id = schema_meta['workspace_id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, workspace_id, user_role)
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
@@ -691,167 +792,108 @@ async def create_device(schema_id: str, data: DeviceCreate, current_user: Dict =
         raise HTTPException(status_code=400, detail=f"Unknown device type: {data.device_type}")
     
     device_id = str(uuid.uuid4())
-    config_json_str = json.dumps(data.config_json) if data.config_json else None
+    config_json_str = orjson.dumps(data.config_json).decode() if data.config_json else None
     
     query = """
         INSERT INTO schema_devices 
         (id, schema_id, device_type, name, model, ip_address, mac_address, position_x, position_y, config_json, created_by)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
     """
-    db.execute_update(query, (
+    # Insert and fetch the created device in one transaction
+    device_result = await db.returning(query, (
         device_id, schema_id, data.device_type, data.name, data.model, data.ip_address,
         data.mac_address, data.position_x, data.position_y, config_json_str, user_id
-    ))
+    ), DEVICE_BY_ID_SQL, (device_id,))
     
-    # Broadcast content update
-    await broadcast_schema_content_updated(schema_id, user_id)
+    # Broadcast content update after the response is sent
+    background_tasks.add_task(broadcast_schema_content_updated, schema_id, user_id)
     
-    # Get created device
-    get_query = """
-        SELECT id, schema_id, device_type, name, model, ip_address, mac_address,
-               position_x, position_y, config_json, created_at, updated_at
-        FROM schema_devices WHERE id = %s
-    """
-    device_result = db.execute_query(get_query, (device_id,))
-    device = dict(device_result[0]) if device_result else {}
-    
-    # Parse config_json
-    if device.get('config_json') and isinstance(device['config_json'], str):
-        try:
-            device['config_json'] = json.loads(device['config_json'])
-        except:
-            device['config_json'] = {}
-    
-    # Convert datetime objects
-    if device.get('created_at'):
-        if isinstance(device['created_at'], datetime):
-            device['created_at'] = device['created_at'].isoformat()
-    if device.get('updated_at'):
-        if isinstance(device['updated_at'], datetime):
-            device['updated_at'] = device['updated_at'].isoformat()
+    device = shape_device(device_result[0]) if device_result else {}
     
     return {"success": True, "device": device}
 
 # UPDATE DEVICE
 @router.put("/api/schemas/{schema_id}/devices/{device_id}")
-async def update_device(schema_id: str, device_id: str, data: DeviceUpdate, current_user: Dict = Depends(get_current_user)):
-    """Update a device (requires write or admin)"""
+async def update_device(schema_id: str, device_id: str, data: DeviceUpdate, background_tasks: BackgroundTasks, echo: str = Query('minimal', description="'full' to return the updated row"), x_fields: Optional[str] = Header(None), current_user: Dict = Depends(get_current_user)):
+    """Update a device (requires write or admin). X-Fields limits the echoed columns."""
     user_id = current_user['id']
     
-    # Check device exists and belongs to schema
-    device_query = """
-        SELECT sd.id, sd.schema_id, s.workspace_id
+    # Check device exists, belongs to schema, and resolve permission in one query
+    device_query = f"""
+        SELECT sd.id, sd.schema_id, s.workspace_id, {PERMISSION_LEVEL_SQL} AS permission_level, NOW() AS db_now
         FROM schema_devices sd
         JOIN `schemas` s ON sd.schema_id = s.id
         WHERE sd.id = %s AND sd.schema_id = %s
     """
-    device_result = db.execute_query(device_query, (device_id, schema_id))
-    if not device_result:
-        raise HTTPException(status_code=404, detail="Device not found")
-    
-    workspace_id = device_result[0]['workspace_id']
-    user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
-    
-    if permission not in ['write', 'admin']:
-        raise HTTPException(status_code=403, detail="Write permission required")
-    
-    # Build update query
-    updates = []
-    params = []
-    
-    if data.name is not None:
-        updates.append("name = %s")
-        params.append(data.name)
-    if data.position_x is not None:
-        updates.append("position_x = %s")
-        params.append(data.position_x)
-    if data.position_y is not None:
-        updates.append("position_y = %s")
-        params.append(data.position_y)
-    if data.model is not None:
-        updates.append("model = %s")
-        params.append(data.model)
-    if data.ip_address is not None:
-        updates.append("ip_address = %s")
-        params.append(data.ip_address)
-    if data.mac_address is not None:
-        updates.append("mac_address = %s")
-        params.append(data.mac_address)
-    if data.config_json is not None:
-        updates.append("config_json = %s")
-        params.append(json.dumps(data.config_json))
-    
-    if not updates:
-        return {"success": True, "message": "No changes"}
+    params = (
+        data.name, data.position_x, data.position_y, data.model,
+        data.ip_address, data.mac_address, _dumps_or_none(data.config_json),
+    )
+    fields = parse_device_fields(x_fields)
     
-    params.extend([device_id])
-    update_query = f"""
-        UPDATE schema_devices 
-        SET {', '.join(updates)}, updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
-    """
-    db.execute_update(update_query, tuple(params))
+    # Check, update and reselect on one connection with a single commit
+    async with db.transaction() as tx:
+        device_result = await tx.fetch(device_query, (user_id, user_id, device_id, schema_id))
+        if not device_result:
+            raise HTTPException(status_code=404, detail="Device not found")
+        
+        permission = permission_from_level(device_result[0]['permission_level'], current_user.get('role'))
+        
+        if permission not in ['write', 'admin']:
+            raise HTTPException(status_code=403, detail="Write permission required")
+        
+        if all(value is None for value in params):
+            return {"success": True, "message": "No changes"}
+        
+        # Stamp with the database clock, like every other updated_at the server writes
+        updated_at = device_result[0]['db_now']
+        await tx.execute(DEVICE_UPDATE_SQL, params + (updated_at, device_id))
+        
+        # The client already holds the row it just edited, so only reselect when asked to
+        if echo != 'full' and fields is None:
+            device_result = None
+        else:
+            select_query = DEVICE_BY_ID_SQL if fields is None else device_fields_sql(fields)
+            device_result = await tx.fetch(select_query, (device_id,))
     
-    # Broadcast content update
-    await broadcast_schema_content_updated(schema_id, user_id)
+    # Broadcast content update after the response is sent
+    background_tasks.add_task(broadcast_schema_content_updated, schema_id, user_id)
     
-    # Get updated device
-    get_query = """
-        SELECT id, schema_id, device_type, name, model, ip_address, mac_address,
-               position_x, position_y, config_json, created_at, updated_at
-        FROM schema_devices WHERE id = %s
-    """
-    device_result = db.execute_query(get_query, (device_id,))
-    device = dict(device_result[0]) if device_result else {}
+    if device_result is None:
+        return {"success": True, "id": device_id, "updated_at": updated_at}
     
-    # Parse config_json
-    if device.get('config_json') and isinstance(device['config_json'], str):
-        try:
-            device['config_json'] = json.loads(device['config_json'])
-        except:
-            device['config_json'] = {}
-    
-    # Convert datetime objects
-    if device.get('created_at'):
-        if isinstance(device['created_at'], datetime):
-            device['created_at'] = device['created_at'].isoformat()
-    if device.get('updated_at'):
-        if isinstance(device['updated_at'], datetime):
-            device['updated_at'] = device['updated_at'].isoformat()
+    device = shape_device(device_result[0]) if device_result else {}
     
     return {"success": True, "device": device}
 
 # DELETE DEVICE
 @router.delete("/api/schemas/{schema_id}/devices/{device_id}")
-async def delete_device(schema_id: str, device_id: str, current_user: Dict = Depends(get_current_user)):
+async def delete_device(schema_id: str, device_id: str, background_tasks: BackgroundTasks, current_user: Dict = Depends(get_current_user)):
     """Delete a device (requires write or admin)"""
     user_id = current_user['id']
     
-    # Check device exists and belongs to schema
-    device_query = """
-        SELECT sd.id, s.workspace_id
+    # Check device exists, belongs to schema, and resolve permission in one query
+    device_query = f"""
+        SELECT sd.id, s.workspace_id, {PERMISSION_LEVEL_SQL} AS permission_level
         FROM schema_devices sd
         JOIN `schemas` s ON sd.schema_id = s.id
         WHERE sd.id = %s AND sd.schema_id = %s
     """
-    device_result = db.execute_query(device_query, (device_id, schema_id))
+    device_result = await db.fetch(device_query, (user_id, user_id, device_id, schema_id))
     if not device_result:
         raise HTTPException(status_code=404, detail="Device not found")
     
-    workspace_id = device_result[0]['workspace_id']
-    user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = permission_from_level(device_result[0]['permission_level'], current_user.get('role'))
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
     
     # Delete device (CASCADE will handle connections)
     delete_query = "DELETE FROM schema_devices WHERE id = %s"
-    db.execute_update(delete_query, (device_id,))
+    await db.execute(delete_query, (device_id,))
     
-    # Broadcast content update
-    await broadcast_schema_content_updated(schema_id, user_id)
+    # Broadcast content update after the response is sent
+    background_tasks.add_task(broadcast_schema_content_updated, schema_id, user_id)
     
     return {"success": True, "message": "Device deleted"}
 
@@ -865,243 +907,229 @@ async def get_schema_connections(schema_id: str, current_user: Dict = Depends(ge
     user_id = current_user['id']
     
     # Check schema exists and get workspace
-    schema_query = "SELECT workspace_id FROM `schemas` WHERE id = %s"
-    schema_result = db.execute_query(schema_query, (schema_id,))
-    if not schema_result:
+    schema_meta = await get_schema_meta(schema_id)
+    if not schema_meta:
         raise HTTPException(status_code=404, detail="Schema not found")
     
-    workspace_id = schema_result[0]['workspace_id']
+    workspace_id = schema_meta['workspace_id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, workspace_id, user_role)
     
     if permission == 'none':
         raise HTTPException(status_code=403, detail="Access denied")
     
-    # Get connections
-    connections_query = """
-        SELECT id, schema_id, from_device_id, from_port, to_device_id, to_port,
-               connection_type, bandwidth, vlan_id, config_json, created_at, updated_at
-        FROM schema_connections WHERE schema_id = %s
-    """
-    connections_result = db.execute_query(connections_query, (schema_id,))
-    connections = []
-    for conn in connections_result:
-        conn_dict = dict(conn)
-        # Parse config_json if it's a string
-        if conn_dict.get('config_json') and isinstance(conn_dict['config_json'], str):
-            try:
-                conn_dict['config_json'] = json.loads(conn_dict['config_json'])
-            except:
-                conn_dict['config_json'] = {}
-        # Convert datetime objects
-        if conn_dict.get('created_at'):
-            if isinstance(conn_dict['created_at'], datetime):
-                conn_dict['created_at'] = conn_dict['created_at'].isoformat()
-        if conn_dict.get('updated_at'):
-            if isinstance(conn_dict['updated_at'], datetime):
-                conn_dict['updated_at'] = conn_dict['updated_at'].isoformat()
-        connections.append(conn_dict)
-    
-    return {"success": True, "connections": connections}
+    # Stream connections straight from the server cursor instead of building the full list
+    async def generate():
+        yield b'{"success":true,"connections":['
+        separator = b''
+        async for rows in db.stream(CONNECTIONS_BY_SCHEMA_SQL, (schema_id,)):
+            for row in rows:
+                yield separator + orjson.dumps(shape_connection(row))
+                separator = b','
+        yield b']}'
+    
+    return StreamingResponse(generate(), media_type="application/json")
 
 # CREATE CONNECTION
 @router.post("/api/schemas/{schema_id}/connections")
-async def create_connection(schema_id: str, data: ConnectionCreate, current_user: Dict = Depends(get_current_user)):
+async def create_connection(schema_id: str, data: ConnectionCreate, background_tasks: BackgroundTasks, current_user: Dict = Depends(get_current_user)):
     """Create a connection between devices (requires write or admin)"""
     user_id = current_user['id']
     
-    # Check schema exists and get workspace
-    schema_query = "SELECT workspace_id, type FROM `schemas` WHERE id = %s"
-    schema_result = db.execute_query(schema_query, (schema_id,))
-    if not schema_result:
+    # Check schema, permission and both devices in one query; duplicates are caught by the unique key
+    check_query = f"""
+        SELECT s.workspace_id, s.type, {PERMISSION_LEVEL_SQL} AS permission_level,
+               (SELECT COUNT(*) FROM schema_devices sd
+                WHERE sd.id IN (%s, %s) AND sd.schema_id = s.id) AS devices_found
+        FROM `schemas` s WHERE s.id = %s
+    """
+    connection_id = str(uuid.uuid4())
+    config_json_str = orjson.dumps(data.config_json).decode() if data.config_json else None
+    
+    # Check, insert and fetch the created connection on one connection with a single commit
+    async with db.transaction() as tx:
+        check_result = await tx.fetch(check_query, (
+            user_id, user_id,
+            data.from_device_id, data.to_device_id,
+            schema_id
+        ))
+        if not check_result:
+            raise HTTPException(status_code=404, detail="Schema not found")
+        check = check_result[0]
+        
+        if check['type'] != 'schema':
+            raise HTTPException(status_code=400, detail="Can only add connections to schemas, not folders")
+        
+        permission = permission_from_level(check['permission_level'], current_user.get('role'))
+        
+        if permission not in ['write', 'admin']:
+            raise HTTPException(status_code=403, detail="Write permission required")
+        
+        # Validate devices exist and belong to schema
+        if check['devices_found'] != 2:
+            raise HTTPException(status_code=400, detail="Both devices must exist in the schema")
+        
+        try:
+            await tx.execute(CONNECTION_INSERT_SQL, (
+                connection_id, schema_id, data.from_device_id, data.from_port,
+                data.to_device_id, data.to_port, data.connection_type, data.bandwidth,
+                data.vlan_id, config_json_str
+            ))
+        except pymysql.err.IntegrityError as e:
+            if is_duplicate_key(e):
+                raise HTTPException(status_code=400, detail="Connection already exists")
+            raise
+        conn_result = await tx.fetch(CONNECTION_BY_ID_SQL, (connection_id,))
+    
+    # Broadcast content update after the response is sent
+    background_tasks.add_task(broadcast_schema_content_updated, schema_id, user_id)
+    
+    connection = shape_connection(conn_result[0]) if conn_result else {}
+    
+    return {"success": True, "connection": connection}
+
+# CREATE CONNECTIONS (BATCH)
+@router.post("/api/schemas/{schema_id}/connections/batch")
+async def create_connections_batch(schema_id: str, data: ConnectionBatchCreate, background_tasks: BackgroundTasks, current_user: Dict = Depends(get_current_user)):
+    """Create several connections in one request (requires write or admin)"""
+    user_id = current_user['id']
+    
+    if not data.connections:
+        raise HTTPException(status_code=400, detail="No connections to create")
+    if len(data.connections) > MAX_CONNECTION_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_CONNECTION_BATCH} connections per batch")
+    
+    endpoints = [(c.from_device_id, c.from_port, c.to_device_id, c.to_port) for c in data.connections]
+    if len(set(endpoints)) != len(endpoints):
+        raise HTTPException(status_code=400, detail="Duplicate connections in batch")
+    
+    device_ids = list({device_id for c in data.connections for device_id in (c.from_device_id, c.to_device_id)})
+    device_placeholders = ', '.join(['%s'] * len(device_ids))
+    
+    # Check schema, permission and all devices in one query; duplicates are caught by the unique key
+    check_query = f"""
+        SELECT s.type, {PERMISSION_LEVEL_SQL} AS permission_level,
+               (SELECT COUNT(*) FROM schema_devices sd
+                WHERE sd.id IN ({device_placeholders}) AND sd.schema_id = s.id) AS devices_found
+        FROM `schemas` s WHERE s.id = %s
+    """
+    check_result = await db.fetch(check_query, (user_id, user_id, *device_ids, schema_id))
+    if not check_result:
         raise HTTPException(status_code=404, detail="Schema not found")
+    check = check_result[0]
     
-    if schema_result[0]['type'] != 'schema':
+    if check['type'] != 'schema':
         raise HTTPException(status_code=400, detail="Can only add connections to schemas, not folders")
     
-    workspace_id = schema_result[0]['workspace_id']
-    user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = permission_from_level(check['permission_level'], current_user.get('role'))
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
     
-    # Validate devices exist and belong to schema
-    devices_query = """
-        SELECT id FROM schema_devices 
-        WHERE id IN (%s, %s) AND schema_id = %s
-    """
-    devices_result = db.execute_query(devices_query, (data.from_device_id, data.to_device_id, schema_id))
-    if len(devices_result) != 2:
-        raise HTTPException(status_code=400, detail="Both devices must exist in the schema")
-    
-    # Check for duplicate connection
-    duplicate_query = """
-        SELECT id FROM schema_connections 
-        WHERE schema_id = %s AND from_device_id = %s AND from_port = %s 
-        AND to_device_id = %s AND to_port = %s
-    """
-    duplicate_result = db.execute_query(duplicate_query, (
-        schema_id, data.from_device_id, data.from_port, data.to_device_id, data.to_port
-    ))
-    if duplicate_result:
-        raise HTTPException(status_code=400, detail="Connection already exists")
+    if check['devices_found'] != len(device_ids):
+        raise HTTPException(status_code=400, detail="All devices must exist in the schema")
     
-    connection_id = str(uuid.uuid4())
-    config_json_str = json.dumps(data.config_json) if data.config_json else None
+    connection_ids = [str(uuid.uuid4()) for _ in data.connections]
+    rows = [
+        (
+            connection_id, schema_id, c.from_device_id, c.from_port, c.to_device_id, c.to_port,
+            c.connection_type, c.bandwidth, c.vlan_id,
+            orjson.dumps(c.config_json).decode() if c.config_json else None
+        )
+        for connection_id, c in zip(connection_ids, data.connections)
+    ]
+    # pymysql rewrites executemany on a plain INSERT ... VALUES into one multi-row INSERT
+    try:
+        await db.execute_batch(CONNECTION_INSERT_SQL, rows)
+    except pymysql.err.IntegrityError as e:
+        if is_duplicate_key(e):
+            raise HTTPException(status_code=400, detail="Connection already exists")
+        raise
     
-    query = """
-        INSERT INTO schema_connections 
-        (id, schema_id, from_device_id, from_port, to_device_id, to_port, 
-         connection_type, bandwidth, vlan_id, config_json)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-    """
-    db.execute_update(query, (
-        connection_id, schema_id, data.from_device_id, data.from_port,
-        data.to_device_id, data.to_port, data.connection_type, data.bandwidth,
-        data.vlan_id, config_json_str
-    ))
+    id_placeholders = ', '.join(['%s'] * len(connection_ids))
+    conn_result = await db.fetch(CONNECTION_SELECT_SQL + f"WHERE id IN ({id_placeholders})", tuple(connection_ids))
     
-    # Broadcast content update
-    await broadcast_schema_content_updated(schema_id, user_id)
+    # Broadcast content update once for the whole batch
+    background_tasks.add_task(broadcast_schema_content_updated, schema_id, user_id)
     
-    # Get created connection
-    get_query = """
-        SELECT id, schema_id, from_device_id, from_port, to_device_id, to_port,
-               connection_type, bandwidth, vlan_id, config_json, created_at, updated_at
-        FROM schema_connections WHERE id = %s
-    """
-    conn_result = db.execute_query(get_query, (connection_id,))
-    connection = dict(conn_result[0]) if conn_result else {}
+    connections = [shape_connection(row) for row in conn_result]
     
-    # Parse config_json
-    if connection.get('config_json') and isinstance(connection['config_json'], str):
-        try:
-            connection['config_json'] = json.loads(connection['config_json'])
-        except:
-            connection['config_json'] = {}
-    
-    # Convert datetime objects
-    if connection.get('created_at'):
-        if isinstance(connection['created_at'], datetime):
-            connection['created_at'] = connection['created_at'].isoformat()
-    if connection.get('updated_at'):
-        if isinstance(connection['updated_at'], datetime):
-            connection['updated_at'] = connection['updated_at'].isoformat()
-    
-    return {"success": True, "connection": connection}
+    return {"success": True, "connections": connections}
 
 # UPDATE CONNECTION
 @router.put("/api/schemas/{schema_id}/connections/{connection_id}")
-async def update_connection(schema_id: str, connection_id: str, data: ConnectionUpdate, current_user: Dict = Depends(get_current_user)):
+async def update_connection(schema_id: str, connection_id: str, data: ConnectionUpdate, background_tasks: BackgroundTasks, echo: str = Query('minimal', description="'full' to return the updated row"), current_user: Dict = Depends(get_current_user)):
     """Update a connection (requires write or admin)"""
     user_id = current_user['id']
     
-    # Check connection exists and belongs to schema
-    conn_query = """
-        SELECT sc.id, s.workspace_id
+    # Check connection exists, belongs to schema, and resolve permission in one query
+    conn_query = f"""
+        SELECT sc.id, s.workspace_id, {PERMISSION_LEVEL_SQL} AS permission_level, NOW() AS db_now
         FROM schema_connections sc
         JOIN `schemas` s ON sc.schema_id = s.id
         WHERE sc.id = %s AND sc.schema_id = %s
     """
-    conn_result = db.execute_query(conn_query, (connection_id, schema_id))
-    if not conn_result:
-        raise HTTPException(status_code=404, detail="Connection not found")
-    
-    workspace_id = conn_result[0]['workspace_id']
-    user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
-    
-    if permission not in ['write', 'admin']:
-        raise HTTPException(status_code=403, detail="Write permission required")
-    
-    # Build update query
-    updates = []
-    params = []
-    
-    if data.connection_type is not None:
-        updates.append("connection_type = %s")
-        params.append(data.connection_type)
-    if data.bandwidth is not None:
-        updates.append("bandwidth = %s")
-        params.append(data.bandwidth)
-    if data.vlan_id is not None:
-        updates.append("vlan_id = %s")
-        params.append(data.vlan_id)
-    if data.config_json is not None:
-        updates.append("config_json = %s")
-        params.append(json.dumps(data.config_json))
-    
-    if not updates:
-        return {"success": True, "message": "No changes"}
+    params = (data.connection_type, data.bandwidth, data.vlan_id, _dumps_or_none(data.config_json))
     
-    params.append(connection_id)
-    update_query = f"""
-        UPDATE schema_connections 
-        SET {', '.join(updates)}, updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
-    """
-    db.execute_update(update_query, tuple(params))
+    # Check, update and reselect on one connection with a single commit
+    async with db.transaction() as tx:
+        conn_result = await tx.fetch(conn_query, (user_id, user_id, connection_id, schema_id))
+        if not conn_result:
+            raise HTTPException(status_code=404, detail="Connection not found")
+        
+        permission = permission_from_level(conn_result[0]['permission_level'], current_user.get('role'))
+        
+        if permission not in ['write', 'admin']:
+            raise HTTPException(status_code=403, detail="Write permission required")
+        
+        if all(value is None for value in params):
+            return {"success": True, "message": "No changes"}
+        
+        # Stamp with the database clock, like every other updated_at the server writes
+        updated_at = conn_result[0]['db_now']
+        await tx.execute(CONNECTION_UPDATE_SQL, params + (updated_at, connection_id))
+        
+        # The client already holds the row it just edited, so only reselect when asked to
+        conn_result = await tx.fetch(CONNECTION_BY_ID_SQL, (connection_id,)) if echo == 'full' else None
     
-    # Broadcast content update
-    await broadcast_schema_content_updated(schema_id, user_id)
+    # Broadcast content update after the response is sent
+    background_tasks.add_task(broadcast_schema_content_updated, schema_id, user_id)
     
-    # Get updated connection
-    get_query = """
-        SELECT id, schema_id, from_device_id, from_port, to_device_id, to_port,
-               connection_type, bandwidth, vlan_id, config_json, created_at, updated_at
-        FROM schema_connections WHERE id = %s
-    """
-    conn_result = db.execute_query(get_query, (connection_id,))
-    connection = dict(conn_result[0]) if conn_result else {}
+    if conn_result is None:
+        return {"success": True, "id": connection_id, "updated_at": updated_at}
     
-    # Parse config_json
-    if connection.get('config_json') and isinstance(connection['config_json'], str):
-        try:
-            connection['config_json'] = json.loads(connection['config_json'])
-        except:
-            connection['config_json'] = {}
-    
-    # Convert datetime objects
-    if connection.get('created_at'):
-        if isinstance(connection['created_at'], datetime):
-            connection['created_at'] = connection['created_at'].isoformat()
-    if connection.get('updated_at'):
-        if isinstance(connection['updated_at'], datetime):
-            connection['updated_at'] = connection['updated_at'].isoformat()
+    connection = shape_connection(conn_result[0]) if conn_result else {}
     
     return {"success": True, "connection": connection}
 
 # DELETE CONNECTION
 @router.delete("/api/schemas/{schema_id}/connections/{connection_id}")
-async def delete_connection(schema_id: str, connection_id: str, current_user: Dict = Depends(get_current_user)):
+async def delete_connection(schema_id: str, connection_id: str, background_tasks: BackgroundTasks, current_user: Dict = Depends(get_current_user)):
     """Delete a connection (requires write or admin)"""
     user_id = current_user['id']
     
-    # Check connection exists and belongs to schema
-    conn_query = """
-        SELECT sc.id, s.workspace_id
+    # Check connection exists, belongs to schema, and resolve permission in one query
+    conn_query = f"""
+        SELECT sc.id, s.workspace_id, {PERMISSION_LEVEL_SQL} AS permission_level
         FROM schema_connections sc
         JOIN `schemas` s ON sc.schema_id = s.id
         WHERE sc.id = %s AND sc.schema_id = %s
     """
-    conn_result = db.execute_query(conn_query, (connection_id, schema_id))
+    conn_result = await db.fetch(conn_query, (user_id, user_id, connection_id, schema_id))
     if not conn_result:
         raise HTTPException(status_code=404, detail="Connection not found")
     
-    workspace_id = conn_result[0]['workspace_id']
-    user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = permission_from_level(conn_result[0]['permission_level'], current_user.get('role'))
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
     
     # Delete connection
     delete_query = "DELETE FROM schema_connections WHERE id = %s"
-    db.execute_update(delete_query, (connection_id,))
+    await db.execute(delete_query, (connection_id,))
     
-    # Broadcast content update
-    await broadcast_schema_content_updated(schema_id, user_id)
+    # Broadcast content update after the response is sent
+    background_tasks.add_task(broadcast_schema_content_updated, schema_id, user_id)
     
     return {"success": True, "message": "Connection deleted"}
 
@@ -1114,19 +1142,18 @@ async def get_schema_tags(schema_id: str, current_user: Dict = Depends(get_curre
     user_id = current_user['id']
     
     # Check schema exists and get workspace
-    schema_query = "SELECT workspace_id FROM `schemas` WHERE id = %s"
-    schema_result = db.execute_query(schema_query, (schema_id,))
-    if not schema_result:
+    schema_meta = await get_schema_meta(schema_id)
+    if not schema_meta:
         raise HTTPException(status_code=404, detail="Schema not found")
     
-    workspace_id = schema_result[0]['workspace_id']
+    workspace_id = schema_meta['workspace_id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, workspace_id, user_role)
     
     if permission == 'none':
         raise HTTPException(status_code=403, detail="Access denied")
     
-    tags = fetch_schema_tags(schema_id)
+    tags = await asyncio.to_thread(fetch_schema_tags, schema_id)
     return {"success": True, "tags": tags}
 
 # UPDATE TAGS
@@ -1136,19 +1163,18 @@ async def update_schema_tags_endpoint(schema_id: str, data: TagsUpdate, current_
     user_id = current_user['id']
     
     # Check schema exists and get workspace
-    schema_query = "SELECT workspace_id FROM `schemas` WHERE id = %s"
-    schema_result = db.execute_query(schema_query, (schema_id,))
-    if not schema_result:
+    schema_meta = await get_schema_meta(schema_id)
+    if not schema_meta:
         raise HTTPException(status_code=404, detail="Schema not found")
     
-    workspace_id = schema_result[0]['workspace_id']
+    workspace_id = schema_meta['workspace_id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, workspace_id, user_role)
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
     
-    tags = update_schema_tags(schema_id, data.tags)
+    tags = await asyncio.to_thread(update_schema_tags, schema_id, data.tags)
     return {"success": True, "tags": tags}
 
 # GET TAG SUGGESTIONS
@@ -1159,25 +1185,37 @@ async def get_schema_tag_suggestions(
     current_user: Dict = Depends(get_current_user)
 ):
     """Get tag suggestions (requires read permission)"""
-    search_query = query.strip().lower()
+    search_query = query.strip()
     
     if search_query:
+        # Prefix matches first, from an index range on the case-insensitive name column;
+        # only a short page falls back to the substring scan for mid-name matches
+        pattern = search_query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
         sql_query = """
-            SELECT DISTINCT t.id, t.name
+            SELECT t.id, t.name
             FROM tags t
-            WHERE LOWER(t.name) LIKE %s
+            WHERE t.name LIKE %s
             ORDER BY t.name
             LIMIT %s
         """
-        results = db.execute_query(sql_query, (f"%{search_query}%", limit))
+        results = list(await db.fetch(sql_query, (f"{pattern}%", limit)))
+        if len(results) < limit:
+            substring_query = """
+                SELECT t.id, t.name
+                FROM tags t
+                WHERE t.name LIKE %s AND t.name NOT LIKE %s
+                ORDER BY t.name
+                LIMIT %s
+            """
+            results += await db.fetch(substring_query, (f"%{pattern}%", f"{pattern}%", limit - len(results)))
     else:
         sql_query = """
-            SELECT DISTINCT t.id, t.name
+            SELECT t.id, t.name
             FROM tags t
             ORDER BY t.name
             LIMIT %s
         """
-        results = db.execute_query(sql_query, (limit,))
+        results = await db.fetch(sql_query, (limit,))
     
     tags = [dict(row) for row in results]
     return {"success": True, "tags": tags}
@@ -1191,48 +1229,39 @@ async def lock_schema(schema_id: str, data: LockRequest, current_user: Dict = De
     user_id = current_user['id']
     
     # Check schema exists and get workspace
-    schema_query = "SELECT workspace_id, type FROM `schemas` WHERE id = %s"
-    schema_result = db.execute_query(schema_query, (schema_id,))
-    if not schema_result:
+    schema_meta = await get_schema_meta(schema_id)
+    if not schema_meta:
         raise HTTPException(status_code=404, detail="Schema not found")
     
-    if schema_result[0]['type'] != 'schema':
+    if schema_meta['type'] != 'schema':
         raise HTTPException(status_code=400, detail="Can only lock schemas, not folders")
     
-    workspace_id = schema_result[0]['workspace_id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, schema_meta['workspace_id'], user_role)
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
     
-    # Check if already locked
-    lock_query = "SELECT user_id, user_name, locked_at FROM schema_locks WHERE schema_id = %s"
-    lock_result = db.execute_query(lock_query, (schema_id,))
-    
-    if lock_result:
-        lock_info = lock_result[0]
-        locked_at = lock_info['locked_at']
-        # Check if lock is expired
-        if locked_at and isinstance(locked_at, datetime) and (datetime.now() - locked_at) > timedelta(minutes=LOCK_TIMEOUT_MINUTES):
-            # Lock expired, remove it
-            db.execute_update("DELETE FROM schema_locks WHERE schema_id = %s", (schema_id,))
-        else:
-            # Still locked by someone else
-            if lock_info['user_id'] != data.user_id:
-                raise HTTPException(status_code=409, detail="Schema is locked by another user")
-    
-    # Create or update lock
-    upsert_query = """
+    # Take the lock in one statement: an existing lock is only overwritten when it is
+    # ours or has expired. MySQL applies the assignments left to right, so user_id goes
+    # first; once it is ours the remaining columns follow the same decision.
+    can_take = "(user_id = VALUES(user_id) OR locked_at < NOW() - INTERVAL %s MINUTE)"
+    upsert_query = f"""
         INSERT INTO schema_locks (schema_id, user_id, user_name, locked_at, last_heartbeat)
         VALUES (%s, %s, %s, NOW(), NOW())
         ON DUPLICATE KEY UPDATE
-            user_id = VALUES(user_id),
-            user_name = VALUES(user_name),
-            locked_at = NOW(),
-            last_heartbeat = NOW()
+            user_id = IF({can_take}, VALUES(user_id), user_id),
+            user_name = IF(user_id = VALUES(user_id), VALUES(user_name), user_name),
+            locked_at = IF(user_id = VALUES(user_id), NOW(), locked_at),
+            last_heartbeat = IF(user_id = VALUES(user_id), NOW(), last_heartbeat)
     """
-    db.execute_update(upsert_query, (schema_id, data.user_id, data.user_name))
+    owner_query = "SELECT user_id FROM schema_locks WHERE schema_id = %s"
+    owner_result = await db.returning(upsert_query, (schema_id, data.user_id, data.user_name, LOCK_TIMEOUT_MINUTES),
+                                      owner_query, (schema_id,))
+    
+    # Still locked by someone else
+    if not owner_result or owner_result[0]['user_id'] != data.user_id:
+        raise HTTPException(status_code=409, detail="Schema is locked by another user")
     
     lock_info = {
         'user_id': str(data.user_id),
@@ -1251,22 +1280,20 @@ async def unlock_schema(schema_id: str, user_id: int = Query(..., description="U
     """Unlock a schema (requires write or admin)"""
     current_user_id = current_user['id']
     
-    # Check schema exists
-    schema_query = "SELECT workspace_id FROM `schemas` WHERE id = %s"
-    schema_result = db.execute_query(schema_query, (schema_id,))
-    if not schema_result:
+    # Check schema exists and get workspace
+    schema_meta = await get_schema_meta(schema_id)
+    if not schema_meta:
         raise HTTPException(status_code=404, detail="Schema not found")
     
-    workspace_id = schema_result[0]['workspace_id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(current_user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, current_user_id, schema_meta['workspace_id'], user_role)
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
     
     # Check lock exists and belongs to user (or user is admin)
     lock_query = "SELECT user_id FROM schema_locks WHERE schema_id = %s"
-    lock_result = db.execute_query(lock_query, (schema_id,))
+    lock_result = await db.fetch(lock_query, (schema_id,))
     
     if not lock_result:
         return {"success": True, "message": "Schema not locked"}
@@ -1275,7 +1302,7 @@ async def unlock_schema(schema_id: str, user_id: int = Query(..., description="U
         raise HTTPException(status_code=403, detail="Can only unlock your own locks")
     
     # Delete lock
-    db.execute_update("DELETE FROM schema_locks WHERE schema_id = %s", (schema_id,))
+    await db.execute("DELETE FROM schema_locks WHERE schema_id = %s", (schema_id,))
     
     # Broadcast lock update
     await broadcast_schema_lock_update(schema_id, None)
@@ -1293,13 +1320,11 @@ async def force_unlock_schema(schema_id: str, current_user: Dict = Depends(get_c
         raise HTTPException(status_code=403, detail="Admin permission required")
     
     # Check schema exists
-    schema_query = "SELECT id FROM `schemas` WHERE id = %s"
-    schema_result = db.execute_query(schema_query, (schema_id,))
-    if not schema_result:
+    if not await get_schema_meta(schema_id):
         raise HTTPException(status_code=404, detail="Schema not found")
     
     # Delete lock
-    db.execute_update("DELETE FROM schema_locks WHERE schema_id = %s", (schema_id,))
+    await db.execute("DELETE FROM schema_locks WHERE schema_id = %s", (schema_id,))
     
     # Broadcast lock update
     await broadcast_schema_lock_update(schema_id, None)
@@ -1329,7 +1354,7 @@ async def get_custom_templates(workspace_id: str = Query('demo'), current_user:
     """Get custom device templates for a workspace"""
     user_id = current_user['id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, workspace_id, user_role)
     
     if permission not in ['read', 'write', 'admin']:
         raise HTTPException(status_code=403, detail="Read permission required")
@@ -1340,20 +1365,9 @@ async def get_custom_templates(workspace_id: str = Query('demo'), current_user:
         WHERE workspace_id = %s
         ORDER BY name ASC
     """
-    results = db.execute_query(query, (workspace_id,))
-    
-    templates = []
-    for row in results:
-        template = dict(row)
-        if isinstance(template.get('default_ports'), str):
-            template['default_ports'] = json.loads(template['default_ports'])
-        if isinstance(template.get('default_size'), str):
-            template['default_size'] = json.loads(template['default_size'])
-        if template.get('created_at') and isinstance(template['created_at'], datetime):
-            template['created_at'] = template['created_at'].isoformat()
-        if template.get('updated_at') and isinstance(template['updated_at'], datetime):
-            template['updated_at'] = template['updated_at'].isoformat()
-        templates.append(template)
+    results = await db.fetch(query, (workspace_id,))
+    
+    templates = [shape_template(row) for row in results]
     
     return {"success": True, "templates": templates}
 
@@ -1363,17 +1377,11 @@ async def create_custom_template(data: CustomTemplateCreate, workspace_id: str =
     """Create a custom device template"""
     user_id = current_user['id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, workspace_id, user_role)
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
     
-    # Check if device_type already exists for this workspace
-    check_query = "SELECT id FROM schema_device_templates WHERE workspace_id = %s AND device_type = %s"
-    existing = db.execute_query(check_query, (workspace_id, data.device_type))
-    if existing:
-        raise HTTPException(status_code=400, detail=f"Template with device_type '{data.device_type}' already exists")
-    
     template_id = str(uuid.uuid4())
     
     query = """
@@ -1381,27 +1389,18 @@ async def create_custom_template(data: CustomTemplateCreate, workspace_id: str =
         (id, workspace_id, device_type, name, description, default_ports, icon_svg, default_size, created_by)
         VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
     """
-    db.execute_update(query, (
-        template_id, workspace_id, data.device_type, data.name, data.description,
-        json.dumps(data.default_ports), data.icon_svg, json.dumps(data.default_size), user_id
-    ))
-    
-    # Get created template
-    get_query = """
-        SELECT id, device_type, name, description, default_ports, icon_svg, default_size, created_by, created_at, updated_at
-        FROM schema_device_templates WHERE id = %s
-    """
-    result = db.execute_query(get_query, (template_id,))
-    template = dict(result[0]) if result else {}
-    
-    if isinstance(template.get('default_ports'), str):
-        template['default_ports'] = json.loads(template['default_ports'])
-    if isinstance(template.get('default_size'), str):
-        template['default_size'] = json.loads(template['default_size'])
-    if template.get('created_at') and isinstance(template['created_at'], datetime):
-        template['created_at'] = template['created_at'].isoformat()
-    if template.get('updated_at') and isinstance(template['updated_at'], datetime):
-        template['updated_at'] = template['updated_at'].isoformat()
+    # Insert and fetch the created template in one transaction; the
+    # (workspace_id, device_type) unique key rejects duplicate device types
+    try:
+        result = await db.returning(query, (
+            template_id, workspace_id, data.device_type, data.name, data.description,
+            orjson.dumps(data.default_ports).decode(), data.icon_svg, orjson.dumps(data.default_size).decode(), user_id
+        ), TEMPLATE_BY_ID_SQL, (template_id,))
+    except pymysql.err.IntegrityError as e:
+        if is_duplicate_key(e):
+            raise HTTPException(status_code=400, detail=f"Template with device_type '{data.device_type}' already exists")
+        raise
+    template = shape_template(result[0]) if result else {}
     
     return {"success": True, "template": template}
 
@@ -1411,60 +1410,27 @@ async def update_custom_template(template_id: str, data: CustomTemplateUpdate, w
     """Update a custom device template"""
     user_id = current_user['id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, workspace_id, user_role)
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
     
     # Check template exists and belongs to workspace
     check_query = "SELECT id, created_by FROM schema_device_templates WHERE id = %s AND workspace_id = %s"
-    existing = db.execute_query(check_query, (template_id, workspace_id))
+    existing = await db.fetch(check_query, (template_id, workspace_id))
     if not existing:
         raise HTTPException(status_code=404, detail="Template not found")
     
-    # Build update query dynamically
-    updates = []
-    params = []
-    
-    if data.name is not None:
-        updates.append("name = %s")
-        params.append(data.name)
-    if data.description is not None:
-        updates.append("description = %s")
-        params.append(data.description)
-    if data.default_ports is not None:
-        updates.append("default_ports = %s")
-        params.append(json.dumps(data.default_ports))
-    if data.icon_svg is not None:
-        updates.append("icon_svg = %s")
-        params.append(data.icon_svg)
-    if data.default_size is not None:
-        updates.append("default_size = %s")
-        params.append(json.dumps(data.default_size))
-    
-    if not updates:
+    params = (
+        data.name, data.description, _dumps_or_none(data.default_ports),
+        data.icon_svg, _dumps_or_none(data.default_size),
+    )
+    if all(value is None for value in params):
         raise HTTPException(status_code=400, detail="No fields to update")
     
-    params.extend([template_id, workspace_id])
-    query = f"UPDATE schema_device_templates SET {', '.join(updates)} WHERE id = %s AND workspace_id = %s"
-    db.execute_update(query, tuple(params))
-    
-    # Get updated template
-    get_query = """
-        SELECT id, device_type, name, description, default_ports, icon_svg, default_size, created_by, created_at, updated_at
-        FROM schema_device_templates WHERE id = %s
-    """
-    result = db.execute_query(get_query, (template_id,))
-    template = dict(result[0]) if result else {}
-    
-    if isinstance(template.get('default_ports'), str):
-        template['default_ports'] = json.loads(template['default_ports'])
-    if isinstance(template.get('default_size'), str):
-        template['default_size'] = json.loads(template['default_size'])
-    if template.get('created_at') and isinstance(template['created_at'], datetime):
-        template['created_at'] = template['created_at'].isoformat()
-    if template.get('updated_at') and isinstance(template['updated_at'], datetime):
-        template['updated_at'] = template['updated_at'].isoformat()
+    # Update and fetch the updated template in one transaction
+    result = await db.returning(TEMPLATE_UPDATE_SQL, params + (template_id, workspace_id), TEMPLATE_BY_ID_SQL, (template_id,))
+    template = shape_template(result[0]) if result else {}
     
     return {"success": True, "template": template}
 
@@ -1474,25 +1440,27 @@ async def delete_custom_template(template_id: str, workspace_id: str = Query('de
     """Delete a custom device template"""
     user_id = current_user['id']
     user_role = current_user.get('role')
-    permission = get_workspace_permission_sync(user_id, workspace_id, user_role)
+    permission = await asyncio.to_thread(get_workspace_permission_sync, user_id, workspace_id, user_role)
     
     if permission not in ['write', 'admin']:
         raise HTTPException(status_code=403, detail="Write permission required")
     
-    # Check template exists and belongs to workspace
-    check_query = "SELECT id FROM schema_device_templates WHERE id = %s AND workspace_id = %s"
-    existing = db.execute_query(check_query, (template_id, workspace_id))
-    if not existing:
-        raise HTTPException(status_code=404, detail="Template not found")
-    
-    # Check if template is used by any devices
-    devices_query = "SELECT COUNT(*) as count FROM schema_devices WHERE device_type = (SELECT device_type FROM schema_device_templates WHERE id = %s)"
-    devices_result = db.execute_query(devices_query, (template_id,))
-    if devices_result and devices_result[0].get('count', 0) > 0:
+    # Delete only if no device uses the template's type; a miss means it is absent or in use
+    delete_query = """
+        DELETE t FROM schema_device_templates t
+        LEFT JOIN schema_devices d ON d.device_type = t.device_type
+        WHERE t.id = %s AND t.workspace_id = %s AND d.id IS NULL
+    """
+    deleted = await db.execute(delete_query, (template_id, workspace_id))
+    if not deleted:
+        check_query = """
+            SELECT EXISTS (SELECT 1 FROM schema_devices d WHERE d.device_type = t.device_type) AS used
+            FROM schema_device_templates t WHERE t.id = %s AND t.workspace_id = %s
+        """
+        existing = await db.fetch(check_query, (template_id, workspace_id))
+        if not existing:
+            raise HTTPException(status_code=404, detail="Template not found")
         raise HTTPException(status_code=400, detail="Cannot delete template: it is used by devices")
     
-    delete_query = "DELETE FROM schema_device_templates WHERE id = %s AND workspace_id = %s"
-    db.execute_update(delete_query, (template_id, workspace_id))
-    
     return {"success": True, "message": "Template deleted"}
 
@@ -1,11 +1,86 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import Dict
+from typing import Any, Dict, Optional, Tuple
 from pydantic import BaseModel
 from database import db
 from auth import get_current_user
+import pymysql
+import time
 
 router = APIRouter()
 
+# Global settings rarely change and are read on nearly every page load, so the
+# GET results are kept in-process for a short TTL and expired whenever a setting
+# is written. Expired values are kept as a fallback if the database is unreachable.
+SETTINGS_CACHE_TTL = 30  # seconds
+_TRUTHY = frozenset(('true', '1', 'yes', 'on'))
+_DEFAULTS = {"documents": True, "tasks": True, "passwords": True, "files": True, "schemas": True}
+_settings_cache: Dict[str, Tuple[float, Any]] = {}
+_MISSING = object()
+
+# Whether system_settings exists; checked at startup so reads can skip a doomed query.
+# None means unknown (e.g. the database was not up yet) and is re-checked on the next read.
+_HAS_SETTINGS_TABLE: Optional[bool] = None
+ER_NO_SUCH_TABLE = 1146
+
+def check_settings_table() -> bool:
+    """Record whether the system_settings table exists (called from main.py startup)"""
+    global _HAS_SETTINGS_TABLE
+    try:
+        db.execute_query("SELECT 1 FROM system_settings LIMIT 1")
+        _HAS_SETTINGS_TABLE = True
+    except pymysql.MySQLError as e:
+        # Only a missing table is definitive; connection errors leave the flag unknown
+        if e.args and e.args[0] == ER_NO_SUCH_TABLE:
+            _HAS_SETTINGS_TABLE = False
+    except Exception:
+        pass
+    return bool(_HAS_SETTINGS_TABLE)
+
+def _settings_table_available() -> bool:
+    """Whether system_settings can be read, checking again while its existence is unknown"""
+    if _HAS_SETTINGS_TABLE is None:
+        return check_settings_table()
+    return _HAS_SETTINGS_TABLE
+
+def _cache_get(key: str, allow_stale: bool = False) -> Any:
+    """Return a cached setting value, or _MISSING if absent (or expired unless allow_stale)"""
+    entry = _settings_cache.get(key)
+    if entry is None or (not allow_stale and entry[0] <= time.monotonic()):
+        return _MISSING
+    return entry[1]
+
+def _cache_set(key: str, value: Any):
+    """Cache a setting value for SETTINGS_CACHE_TTL seconds"""
+    _settings_cache[key] = (time.monotonic() + SETTINGS_CACHE_TTL, value)
+
+def _invalidate_settings_cache():
+    """Expire cached settings (call after any system_settings write)"""
+    for key, (_, value) in list(_settings_cache.items()):
+        _settings_cache[key] = (0, value)
+
+def _is_true(value: Any) -> bool:
+    """Interpret a stored setting value as a boolean"""
+    return str(value).lower() in _TRUTHY
+
+def _demo_mode_enabled() -> bool:
+    """Read the demo_mode flag, from the cache when possible"""
+    enabled = _cache_get('demo_mode')
+    if enabled is not _MISSING:
+        return enabled
+    if not _settings_table_available():
+        return False
+    try:
+        row = db.execute_query("SELECT setting_value FROM system_settings WHERE setting_key = 'demo_mode'")
+    except Exception:
+        # Serve the last known value rather than failing while the database is down
+        enabled = _cache_get('demo_mode', allow_stale=True)
+        if enabled is _MISSING:
+            raise
+        return enabled
+    enabled = _is_true(row[0]['setting_value']) if row else False
+    _cache_set('demo_mode', enabled)
+    return enabled
+
 class ModuleSettings(BaseModel):
     documents: bool = True
     tasks: bool = True
@@ -16,31 +91,35 @@ class ModuleSettings(BaseModel):
 @router.get("/api/admin/settings/modules")
 async def get_module_settings(user: Dict = Depends(get_current_user)):
     """Get enabled modules configuration"""
-    # Ensure table exists (lazy check, though main.py should handle it)
+    cached = _cache_get('modules')
+    if cached is not _MISSING:
+        return dict(cached)
+    if not _settings_table_available():
+        return dict(_DEFAULTS)
+    
     try:
-        settings = db.execute_query("SELECT setting_key, setting_value FROM system_settings WHERE setting_key LIKE 'module_%'")
+        # The pattern is bound as a parameter: a literal % in the SQL text breaks pymysql's
+        # parameter formatting, and the underscore is escaped so it only matches itself
+        settings = db.execute_query(
+            "SELECT SUBSTRING(setting_key, 8) AS module, setting_value FROM system_settings WHERE setting_key LIKE %s",
+            ('module\\_%',)
+        )
     except Exception:
-        # Table might not exist yet if main.py hasn't run or failed
-        return {"documents": True, "tasks": True, "passwords": True, "files": True, "schemas": True}
-    
-    # Default values
-    result = {
-        "documents": True,
-        "tasks": True,
-        "passwords": True,
-        "files": True,
-        "schemas": True
-    }
+        # Database unavailable: prefer the last known settings over the defaults
+        cached = _cache_get('modules', allow_stale=True)
+        if cached is not _MISSING:
+            return dict(cached)
+        return dict(_DEFAULTS)
     
+    result = dict(_DEFAULTS)
     for row in settings:
-        key = row['setting_key'].replace('module_', '')
-        # Check for 'true' string, or boolean 1/0 if stored that way (but we use text column usually for settings)
-        # forcing string comparison for safety
-        value = str(row['setting_value']).lower() in ('true', '1', 'yes', 'on')
-        if key in result:
-            result[key] = value
-            
-    return result
+        key = row['module']
+        # Unknown keys are skipped before their value is parsed
+        if key in _DEFAULTS:
+            result[key] = _is_true(row['setting_value'])
+    
+    _cache_set('modules', result)
+    return dict(result)
 
 @router.post("/api/admin/settings/modules")
 async def update_module_settings(settings: ModuleSettings, user: Dict = Depends(get_current_user)):
@@ -48,18 +127,17 @@ async def update_module_settings(settings: ModuleSettings, user: Dict = Depends(
     if user.get('role') != 'admin':
         raise HTTPException(status_code=403, detail="Only admins can update system settings")
         
-    # Upsert settings
-    for key, value in settings.dict().items():
-        db_key = f"module_{key}"
-        db_value = "true" if value else "false"
-        
-        # Check if exists
-        existing = db.execute_query("SELECT 1 FROM system_settings WHERE setting_key = %s", (db_key,))
-        if existing:
-            db.execute_update("UPDATE system_settings SET setting_value = %s WHERE setting_key = %s", (db_value, db_key))
-        else:
-            db.execute_update("INSERT INTO system_settings (setting_key, setting_value) VALUES (%s, %s)", (db_key, db_value))
-            
+    # Upsert all settings in one multi-row statement (setting_key is the primary key)
+    rows = [(f"module_{key}", "true" if value else "false") for key, value in settings.model_dump().items()]
+    db.execute_many(
+        "INSERT INTO system_settings (setting_key, setting_value) VALUES (%s, %s) "
+        "ON DUPLICATE KEY UPDATE setting_value = VALUES(setting_value)",
+        rows
+    )
+    global _HAS_SETTINGS_TABLE
+    _HAS_SETTINGS_TABLE = True
+    _invalidate_settings_cache()
+    
     return {"success": True, "message": "Settings updated"}
 
 # ============================================================
@@ -70,9 +148,7 @@ async def update_module_settings(settings: ModuleSettings, user: Dict = Depends(
 async def get_demo_mode(user: Dict = Depends(get_current_user)):
     """Get demo mode status (admin only)"""
     try:
-        row = db.execute_query("SELECT setting_value FROM system_settings WHERE setting_key = 'demo_mode'")
-        enabled = row[0]['setting_value'].lower() in ('true', '1', 'yes', 'on') if row else False
-        return {"demo_mode": enabled}
+        return {"demo_mode": _demo_mode_enabled()}
     except Exception:
         return {"demo_mode": False}
 
@@ -82,25 +158,27 @@ async def set_demo_mode(user: Dict = Depends(get_current_user)):
     if user.get('role') != 'admin':
         raise HTTPException(status_code=403, detail="Only admins can update system settings")
 
-    # Get current value and toggle
-    row = db.execute_query("SELECT setting_value FROM system_settings WHERE setting_key = 'demo_mode'")
-    current = row[0]['setting_value'].lower() in ('true', '1', 'yes', 'on') if row else False
-    new_value = "false" if current else "true"
+    # Flip the flag in one atomic upsert (a missing row means it was off), then read it
+    # back on the same connection before the row lock is released
+    truthy = tuple(sorted(_TRUTHY))
+    placeholders = ', '.join(['%s'] * len(truthy))
+    row = db.execute_returning(
+        "INSERT INTO system_settings (setting_key, setting_value) VALUES ('demo_mode', 'true') "
+        f"ON DUPLICATE KEY UPDATE setting_value = IF(LOWER(setting_value) IN ({placeholders}), 'false', 'true')",
+        truthy,
+        "SELECT setting_value FROM system_settings WHERE setting_key = 'demo_mode'"
+    )
+    global _HAS_SETTINGS_TABLE
+    _HAS_SETTINGS_TABLE = True
+    _invalidate_settings_cache()
 
-    if row:
-        db.execute_update("UPDATE system_settings SET setting_value = %s WHERE setting_key = 'demo_mode'", (new_value,))
-    else:
-        db.execute_update("INSERT INTO system_settings (setting_key, setting_value) VALUES ('demo_mode', %s)", (new_value,))
-
-    return {"success": True, "demo_mode": new_value == "true"}
+    return {"success": True, "demo_mode": _is_true(row[0]['setting_value']) if row else False}
 
 @router.get("/api/auth/demo-users")
 async def get_demo_users():
     """Public endpoint: returns demo user list if demo mode is enabled"""
     try:
-        row = db.execute_query("SELECT setting_value FROM system_settings WHERE setting_key = 'demo_mode'")
-        enabled = row[0]['setting_value'].lower() in ('true', '1', 'yes', 'on') if row else False
-        if not enabled:
+        if not _demo_mode_enabled():
             return {"demo_mode": False, "users": []}
 
         users = db.execute_query("SELECT id, username, email, role FROM users ORDER BY role DESC, username ASC")
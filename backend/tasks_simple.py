@@ -1,55 +1,86 @@
 from fastapi import APIRouter, HTTPException, Depends, Request, UploadFile, File, Body
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any, Tuple
-from database import db
+from typing import Optional, List, Dict, Any, Tuple, Callable
+from database import db, build_update_sql
 from websocket_broadcasts import broadcast_task_tree_update, broadcast_task_activity_update, broadcast_task_lock_update
+import asyncio
 import uuid
-import json
+import orjson
 from datetime import datetime
 from pathlib import Path
 import os
 import shutil
+import time
 from auth import get_current_user
+from permission_cache import get_cached_permission
 
-# Helper function to check workspace permissions (duplicated from main.py to avoid circular import)
+# Helper function to check workspace permissions (also used by main.py)
 async def check_workspace_permission(workspace_id: str, user: Dict, required_level: str = 'read') -> str:
     """Check user permission for a workspace via groups. Returns permission level if authorized."""
     # Admins have full access to everything
     if user.get('role') == 'admin':
         return 'admin'
 
-    # Get all groups the user belongs to and their permissions for this workspace
+    user_level = get_cached_permission('tasks', user['id'], workspace_id,
+                                       lambda: load_workspace_permission(user['id'], workspace_id))
+    
+    if user_level == 'none':
+        raise HTTPException(status_code=403, detail="Access denied to this workspace")
+
+    # Check if user has required permission level
+    level_map = {'read': 1, 'write': 2, 'admin': 3}
+    if level_map.get(user_level, 0) < level_map.get(required_level, 0):
+        raise HTTPException(status_code=403, detail=f"Insufficient permissions. Requires '{required_level}' level.")
+
+    return user_level
+
+def load_workspace_permission(user_id: int, workspace_id: str) -> str:
+    """Resolve the user's highest group permission on a workspace ('none' if there is none)"""
     query = """
-        SELECT MAX(
+        SELECT COALESCE(MAX(
             CASE gwp.permission_level
                 WHEN 'admin' THEN 3
                 WHEN 'write' THEN 2
                 WHEN 'read' THEN 1
                 ELSE 0
             END
-        ) as max_level,
-        gwp.permission_level
+        ), 0) as max_level
         FROM user_groups ug
         JOIN group_workspace_permissions gwp ON ug.group_id = gwp.group_id
         WHERE ug.user_id = %s AND gwp.workspace_id = %s
-        GROUP BY gwp.workspace_id
-        ORDER BY max_level DESC
-        LIMIT 1
     """
-    permissions = db.execute_query(query, (user['id'], workspace_id))
-    
-    if not permissions or permissions[0]['max_level'] == 0:
-        raise HTTPException(status_code=403, detail="Access denied to this workspace")
-
-    user_level = permissions[0]['permission_level']
-    
-    # Check if user has required permission level
-    level_map = {'read': 1, 'write': 2, 'admin': 3}
-    if level_map.get(user_level, 0) < level_map.get(required_level, 0):
-        raise HTTPException(status_code=403, detail=f"Insufficient permissions. Requires '{required_level}' level.")
+    permissions = db.execute_query(query, (user_id, workspace_id))
+    max_level = permissions[0]['max_level'] if permissions else 0
+    return {3: 'admin', 2: 'write', 1: 'read'}.get(max_level, 'none')
+
+def uuid7() -> str:
+    """Time-ordered UUID (version 7): new task/timeline rows land at the end of the primary key B-tree"""
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), 'big')
+    value = value & ~(0xF << 76) | (0x7 << 76)  # version
+    value = value & ~(0x3 << 62) | (0x2 << 62)  # RFC 4122 variant
+    return str(uuid.UUID(int=value))
+
+# Workspaces a user can write to, for folding the permission check into a mutation's WHERE clause.
+# Takes the user id as parameter.
+WRITABLE_WORKSPACES_SQL = """
+    SELECT gwp.workspace_id
+    FROM user_groups ug
+    JOIN group_workspace_permissions gwp ON ug.group_id = gwp.group_id
+    WHERE ug.user_id = %s AND gwp.permission_level IN ('write', 'admin')
+"""
+
+def write_guard(user: Dict) -> Tuple[str, Tuple]:
+    """WHERE fragment and params limiting a tasks write to workspaces the user can write to"""
+    if user.get('role') == 'admin':
+        return "", ()
+    return f" AND workspace_id IN ({WRITABLE_WORKSPACES_SQL})", (user['id'],)
 
-    return user_level
+async def explain_unmatched_write(task_id: str, user: Dict) -> Dict:
+    """After a guarded write matched no row: 404 if the task is missing, 403 if the user can't write to it"""
+    task = ensure_task_exists(task_id)
+    await check_workspace_permission(task.get('workspace_id', 'demo'), user, 'write')
+    return task
 
 TASK_UPLOAD_DIR = Path("uploads/tasks")
 TASK_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
@@ -57,6 +88,9 @@ TASK_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 TIMELINE_UPLOAD_DIR = Path("uploads/timeline")
 TIMELINE_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+TASK_FILE_MAX_SIZE = 50 * 1024 * 1024  # 50 MB
+TASK_UPLOAD_COPY_CHUNK = 8 * 1024 * 1024
+
 router = APIRouter(prefix="/api")
 
 # Pydantic Models
@@ -124,52 +158,62 @@ class ChecklistItemUpdate(BaseModel):
 
 # Helper function
 def build_task_tree(parent_id: Optional[str] = 'root', workspace_id: str = 'demo', depth: int = 0) -> List[Dict]:
-    """Build task tree recursively"""
-    if depth > 20:
-        return []
-    
+    """Build task tree from a single query over the tasks reachable from parent_id"""
+    # The recursive CTE walks folders down to the depth limit, so orphaned or too-deep
+    # rows are never joined, aggregated or sent back.
     query = """
-        SELECT id, name, type, content, parent_id, status, priority, assigned_to, responsible_user_id, responsible_user_name,
-               sort_order, due_date, created_at, updated_at, workspace_id
-        FROM tasks
-        WHERE parent_id = %s AND id != 'root' AND workspace_id = %s
-        ORDER BY type DESC, sort_order ASC, name ASC
-        LIMIT 200
+        WITH RECURSIVE task_tree AS (
+            SELECT id, type, %s AS depth
+            FROM tasks
+            WHERE parent_id = %s AND id != 'root' AND workspace_id = %s
+            UNION ALL
+            SELECT c.id, c.type, tt.depth + 1
+            FROM tasks c
+            JOIN task_tree tt ON c.parent_id = tt.id
+            WHERE tt.type = 'folder' AND tt.depth < 20 AND c.workspace_id = %s
+        )
+        SELECT t.id, t.name, t.type, t.content, t.parent_id, t.status, t.priority, t.assigned_to,
+               t.responsible_user_id, t.responsible_user_name, t.sort_order, t.due_date, t.created_at, t.updated_at,
+               t.workspace_id, l.user_id AS lock_user_id, l.user_name AS lock_user_name,
+               (SELECT JSON_ARRAYAGG(JSON_OBJECT('user_id', a.user_id, 'user_name', a.user_name))
+                FROM task_assignees a WHERE a.task_id = t.id) AS assignees_json
+        FROM tasks t
+        LEFT JOIN task_locks l ON l.task_id = t.id
+        WHERE t.id IN (SELECT id FROM task_tree)
+        ORDER BY t.type DESC, t.sort_order ASC, t.name ASC
     """
-    tasks = db.execute_query(query, (parent_id, workspace_id))
-    
+    children_by_parent: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for task in db.execute_query(query, (depth, parent_id, workspace_id, workspace_id)):
+        children_by_parent.setdefault(task['parent_id'], []).append(task)
+
+    return assemble_task_tree(children_by_parent, parent_id, depth)
+
+def assemble_task_tree(children_by_parent: Dict[Optional[str], List[Dict[str, Any]]], parent_id: Optional[str], depth: int) -> List[Dict]:
+    """Shape the prefetched tasks of one parent and attach their children"""
+    if depth > 20:
+        return []
+
     result = []
-    for task in tasks:
+    for task in children_by_parent.get(parent_id, [])[:200]:
         task_dict = dict(task)
         
-        # Convert datetime to ISO format
-        if task_dict.get('created_at'):
-            task_dict['created_at'] = task_dict['created_at'].isoformat()
-        if task_dict.get('updated_at'):
-            task_dict['updated_at'] = task_dict['updated_at'].isoformat()
-        if task_dict.get('due_date'):
-            task_dict['due_date'] = task_dict['due_date'].isoformat()
+        # created_at/updated_at/due_date stay datetime/date: orjson writes them as ISO 8601 itself
         if task_dict.get('responsible_user_id') is not None:
             try:
                 task_dict['responsible_user_id'] = int(task_dict['responsible_user_id'])
             except (TypeError, ValueError):
                 task_dict['responsible_user_id'] = None
         
-        # Check lock
-        lock_query = "SELECT user_id, user_name FROM task_locks WHERE task_id = %s"
-        locks = db.execute_query(lock_query, (task['id'],))
-        task_dict['locked_by'] = locks[0] if locks else None
-        
-        # Get assignees
-        assignee_rows = db.execute_query(
-            "SELECT user_id, user_name FROM task_assignees WHERE task_id = %s ORDER BY user_name",
-            (task['id'],)
-        )
-        task_dict['assignees'] = [dict(a) for a in assignee_rows] if assignee_rows else []
+        lock_user_id = task_dict.pop('lock_user_id')
+        lock_user_name = task_dict.pop('lock_user_name')
+        task_dict['locked_by'] = {'user_id': lock_user_id, 'user_name': lock_user_name} if lock_user_name is not None else None
+
+        assignees = orjson.loads(task_dict.pop('assignees_json') or '[]')
+        task_dict['assignees'] = sorted(assignees, key=lambda a: a['user_name'].casefold())
         
         # Get children
         if task['type'] == 'folder':
-            task_dict['children'] = build_task_tree(task['id'], workspace_id, depth + 1)
+            task_dict['children'] = assemble_task_tree(children_by_parent, task['id'], depth + 1)
         
         result.append(task_dict)
     
@@ -177,11 +221,9 @@ def build_task_tree(parent_id: Optional[str] = 'root', workspace_id: str = 'demo
 
 def ensure_task_exists(task_id: str) -> Dict:
     """Ensure task exists and return it"""
-    query = "SELECT * FROM tasks WHERE id = %s"
-    tasks = db.execute_query(query, (task_id,))
-    if not tasks:
+    task = db.execute_query_one("SELECT * FROM tasks WHERE id = %s", (task_id,))
+    if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    task = dict(tasks[0])
     if task.get('responsible_user_id') is not None:
         try:
             task['responsible_user_id'] = int(task['responsible_user_id'])
@@ -198,31 +240,38 @@ def log_task_event(
     user: Optional[Dict] = None,
 ) -> str:
     """Insert a task timeline entry"""
-    entry_id = str(uuid.uuid4())
-    metadata_json = json.dumps(metadata) if metadata else None
-    user_id = user.get('id') if user else None
-    user_name = user.get('username') if user and user.get('username') else (user.get('email') if user else None)
+    row = timeline_event_row(task_id, event_type, title, description, metadata, user)
+    db.execute_update(TIMELINE_INSERT_SQL, row)
+    return row[0]
 
-    query = """
-        INSERT INTO task_timeline (id, task_id, event_type, title, description, metadata, user_id, user_name)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-    """
-    db.execute_update(query, (entry_id, task_id, event_type, title, description, metadata_json, user_id, user_name))
-    return entry_id
+TIMELINE_INSERT_SQL = """
+    INSERT INTO task_timeline (id, task_id, event_type, title, description, metadata, user_id, user_name)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+"""
 
-def serialize_timestamp(value: Any) -> Optional[str]:
-    if isinstance(value, datetime):
-        return value.isoformat()
-    return value
+def timeline_event_row(
+    task_id: str,
+    event_type: str,
+    title: str,
+    description: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    user: Optional[Dict] = None,
+) -> Tuple:
+    """Build the TIMELINE_INSERT_SQL parameters for one event (the entry id comes first)"""
+    entry_id = uuid7()
+    metadata_json = orjson.dumps(metadata).decode() if metadata else None
+    user_id = user.get('id') if user else None
+    user_name = user.get('username') if user and user.get('username') else (user.get('email') if user else None)
+    return (entry_id, task_id, event_type, title, description, metadata_json, user_id, user_name)
 
+# Timestamps are left as datetime values throughout: ORJSONResponse writes them as ISO 8601
 def serialize_timeline_entry(row: Dict[str, Any]) -> Dict[str, Any]:
     metadata = row.get('metadata')
     if metadata and isinstance(metadata, str):
         try:
-            row['metadata'] = json.loads(metadata)
-        except json.JSONDecodeError:
+            row['metadata'] = orjson.loads(metadata)
+        except orjson.JSONDecodeError:
             row['metadata'] = None
-    row['created_at'] = serialize_timestamp(row.get('created_at'))
     # Fetch attached files for this entry
     entry_id = row.get('id')
     task_id = row.get('task_id')
@@ -247,7 +296,6 @@ def fetch_timeline_entry_files(entry_id: str, task_id: Optional[str] = None) ->
         for row in rows:
             item = dict(row)
             item_task_id = task_id or item['task_id']
-            item['uploaded_at'] = serialize_timestamp(item.get('uploaded_at'))
             item['download_url'] = f"/api/tasks/{item_task_id}/timeline/{entry_id}/files/{item['id']}/download"
             result.append(item)
         return result
@@ -266,35 +314,29 @@ def get_timeline_file_record(entry_id: str, file_id: str) -> Optional[Dict[str,
             FROM task_timeline_files
             WHERE id = %s AND timeline_entry_id = %s
         """
-        rows = db.execute_query(query, (file_id, entry_id))
-        if not rows:
+        record = db.execute_query_one(query, (file_id, entry_id))
+        if not record:
             return None
-        record = dict(rows[0])
-        record['uploaded_at'] = serialize_timestamp(record.get('uploaded_at'))
         return record
     except Exception as e:
         # Table might not exist yet
         print(f"Warning: Could not get timeline file record (table may not exist): {e}")
         return None
 
-def serialize_comment(row: Dict[str, Any]) -> Dict[str, Any]:
-    row['created_at'] = serialize_timestamp(row.get('created_at'))
-    return row
-
 def serialize_file(row: Dict[str, Any]) -> Dict[str, Any]:
-    row['uploaded_at'] = serialize_timestamp(row.get('uploaded_at'))
     row['download_url'] = f"/api/tasks/{row['task_id']}/files/{row['id']}/download"
     return row
 
+TASK_TAGS_SQL = """
+    SELECT t.id, t.name
+    FROM task_tag_links ttl
+    JOIN tags t ON ttl.tag_id = t.id
+    WHERE ttl.task_id = %s
+    ORDER BY t.name
+"""
+
 def fetch_task_tags(task_id: str) -> List[Dict[str, Any]]:
-    query = """
-        SELECT t.id, t.name
-        FROM task_tag_links ttl
-        JOIN tags t ON ttl.tag_id = t.id
-        WHERE ttl.task_id = %s
-        ORDER BY t.name
-    """
-    results = db.execute_query(query, (task_id,))
+    results = db.execute_query(TASK_TAGS_SQL, (task_id,))
     return [dict(row) for row in results]
 
 def upsert_tag(name: str) -> Dict[str, Any]:
@@ -302,20 +344,32 @@ def upsert_tag(name: str) -> Dict[str, Any]:
     trimmed = name.strip()
     if not trimmed:
         raise HTTPException(status_code=400, detail="Tag name cannot be empty")
+    return upsert_tags([trimmed])[0]
 
-    existing = db.execute_query(
-        "SELECT id, name FROM tags WHERE LOWER(name) = LOWER(%s)",
-        (trimmed,)
-    )
-    if existing:
-        return dict(existing[0])
-
-    tag_id = str(uuid.uuid4())
-    db.execute_update(
-        "INSERT INTO tags (id, name) VALUES (%s, %s)",
-        (tag_id, trimmed)
+def upsert_tags(names: List[str]) -> List[Dict[str, Any]]:
+    """Create or get several tags in two round trips, in the order given"""
+    if not names:
+        return []
+    # The unique key on tags.name makes concurrent creation safe; the no-op update keeps existing rows
+    db.execute_many(
+        "INSERT INTO tags (id, name) VALUES (%s, %s) ON DUPLICATE KEY UPDATE name = name",
+        [(str(uuid.uuid4()), name) for name in names]
     )
-    return {"id": tag_id, "name": trimmed}
+    placeholders = ','.join(['%s'] * len(names))
+    # tags.name uses a case-insensitive collation, matching the case-insensitive lookup
+    rows = db.execute_query(f"SELECT id, name FROM tags WHERE name IN ({placeholders})", tuple(names))
+    by_name = {row['name'].lower(): dict(row) for row in rows}
+    tags = []
+    for name in names:
+        tag = by_name.get(name.lower())
+        if tag is None:
+            # Matched by the collation but not by lower() (e.g. accent-insensitive): look it up alone
+            match = db.execute_query("SELECT id, name FROM tags WHERE name = %s", (name,))
+            if not match:
+                continue
+            tag = dict(match[0])
+        tags.append(tag)
+    return tags
 
 # Keep for backward compatibility
 def upsert_task_tag(name: str) -> Dict[str, Any]:
@@ -335,14 +389,15 @@ def normalize_tag_names(names: List[str]) -> List[str]:
             unique.append(trimmed)
     return unique
 
+TASK_ASSIGNEES_SQL = """
+    SELECT user_id, user_name
+    FROM task_assignees
+    WHERE task_id = %s
+    ORDER BY user_name
+"""
+
 def fetch_task_assignees(task_id: str) -> List[Dict[str, Any]]:
-    query = """
-        SELECT user_id, user_name
-        FROM task_assignees
-        WHERE task_id = %s
-        ORDER BY user_name
-    """
-    rows = db.execute_query(query, (task_id,))
+    rows = db.execute_query(TASK_ASSIGNEES_SQL, (task_id,))
     return [{'user_id': int(row['user_id']), 'user_name': row['user_name']} for row in rows]
 
 def fetch_task_files(task_id: str) -> List[Dict[str, Any]]:
@@ -361,15 +416,15 @@ def get_task_file_record(task_id: str, file_id: str) -> Optional[Dict[str, Any]]
         FROM task_files
         WHERE task_id = %s AND id = %s
     """
-    rows = db.execute_query(query, (task_id, file_id))
-    if not rows:
+    record = db.execute_query_one(query, (task_id, file_id))
+    if not record:
         return None
-    return serialize_file(dict(rows[0]))
+    return serialize_file(record)
 
 def update_task_tags(task: Dict[str, Any], tag_names: List[str], user: Dict) -> List[Dict[str, Any]]:
     current_tags = fetch_task_tags(task['id'])
     normalized = normalize_tag_names(tag_names)
-    desired_tags: List[Dict[str, Any]] = [upsert_tag(name) for name in normalized]
+    desired_tags = upsert_tags(normalized)
 
     current_ids = {tag['id'] for tag in current_tags}
     desired_ids = {tag['id'] for tag in desired_tags}
@@ -385,12 +440,12 @@ def update_task_tags(task: Dict[str, Any], tag_names: List[str], user: Dict) ->
         )
 
     # Insert new links
-    for tag in desired_tags:
-        if tag['id'] not in current_ids:
-            db.execute_update(
-                "INSERT INTO task_tag_links (task_id, tag_id) VALUES (%s, %s)",
-                (task['id'], tag['id'])
-            )
+    new_links = [(task['id'], tag['id']) for tag in desired_tags if tag['id'] not in current_ids]
+    if new_links:
+        db.execute_many(
+            "INSERT INTO task_tag_links (task_id, tag_id) VALUES (%s, %s) ON DUPLICATE KEY UPDATE tag_id = tag_id",
+            new_links
+        )
 
     if current_ids != desired_ids:
         description = ', '.join([tag['name'] for tag in desired_tags]) if desired_tags else 'No tags'
@@ -406,7 +461,7 @@ def update_task_tags(task: Dict[str, Any], tag_names: List[str], user: Dict) ->
     desired_tags_sorted = sorted(desired_tags, key=lambda tag: tag['name'].lower())
     return desired_tags_sorted
 
-def update_task_assignees(task: Dict[str, Any], assignee_ids: List[int], responsible_id: Optional[int], user: Dict) -> Dict[str, Any]:
+async def update_task_assignees(task: Dict[str, Any], assignee_ids: List[int], responsible_id: Optional[int], user: Dict) -> Dict[str, Any]:
     current_rows = fetch_task_assignees(task['id'])
     current_ids = {row['user_id'] for row in current_rows}
 
@@ -443,14 +498,6 @@ def update_task_assignees(task: Dict[str, Any], assignee_ids: List[int], respons
                 'email': info['email']
             })
 
-    # Reset assignments
-    db.execute_update("DELETE FROM task_assignees WHERE task_id = %s", (task['id'],))
-    for entry in assignees:
-        db.execute_update(
-            "INSERT INTO task_assignees (task_id, user_id, user_name) VALUES (%s, %s, %s)",
-            (task['id'], entry['user_id'], entry['user_name'])
-        )
-
     responsible_name = None
     if responsible_id is not None:
         responsible_entry = next((a for a in assignees if a['user_id'] == responsible_id), None)
@@ -458,36 +505,66 @@ def update_task_assignees(task: Dict[str, Any], assignee_ids: List[int], respons
             raise HTTPException(status_code=400, detail="Responsible user must belong to the assignee list")
         responsible_name = responsible_entry['user_name']
 
-    assigned_to_str = ', '.join([a['user_name'] for a in assignees]) if assignees else None
-    db.execute_update(
-        "UPDATE tasks SET assigned_to = %s, responsible_user_id = %s, responsible_user_name = %s WHERE id = %s",
-        (assigned_to_str, responsible_id, responsible_name, task['id'])
-    )
+    # Only touch the rows that changed: drop removed users, upsert new ones and renamed ones
+    current_names = {row['user_id']: row['user_name'] for row in current_rows}
+    to_remove = list(current_ids - target_ids)
+    to_upsert = [
+        (task['id'], a['user_id'], a['user_name'])
+        for a in assignees
+        if current_names.get(a['user_id']) != a['user_name']
+    ]
 
     previous_names = sorted([row['user_name'] for row in current_rows])
     new_names = sorted([a['user_name'] for a in assignees])
     previous_responsible = task.get('responsible_user_id')
 
+    events: List[Tuple] = []
     if previous_names != new_names:
         description = ', '.join(new_names) if new_names else 'No assignees'
-        log_task_event(
+        events.append(timeline_event_row(
             task_id=task['id'],
             event_type='assignees_updated',
             title='Assignees updated',
             description=description,
             metadata={'assignees': new_names},
             user=user,
-        )
+        ))
 
     if (responsible_id or None) != (previous_responsible or None):
-        log_task_event(
+        events.append(timeline_event_row(
             task_id=task['id'],
             event_type='responsible_changed',
             title='Responsible updated',
             description=responsible_name or 'No responsible',
             metadata={'responsible_id': responsible_id, 'responsible_name': responsible_name},
             user=user,
-        )
+        ))
+
+    assigned_to_str = ', '.join([a['user_name'] for a in assignees]) if assignees else None
+    async with db.transaction() as tx:
+        if to_remove:
+            placeholders = ','.join(['%s'] * len(to_remove))
+            await tx.execute(
+                f"DELETE FROM task_assignees WHERE task_id = %s AND user_id IN ({placeholders})",
+                (task['id'], *to_remove)
+            )
+        if to_upsert:
+            await tx.execute_many(
+                """
+                INSERT INTO task_assignees (task_id, user_id, user_name) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE user_name = VALUES(user_name)
+                """,
+                to_upsert
+            )
+        if (assigned_to_str, responsible_id, responsible_name) != (
+            task.get('assigned_to'), previous_responsible, task.get('responsible_user_name')
+        ):
+            await tx.execute(
+                "UPDATE tasks SET assigned_to = %s, responsible_user_id = %s, responsible_user_name = %s WHERE id = %s",
+                (assigned_to_str, responsible_id, responsible_name, task['id'])
+            )
+        if events:
+            await tx.execute_many(TIMELINE_INSERT_SQL, events)
 
     task['responsible_user_id'] = responsible_id
     task['responsible_user_name'] = responsible_name
@@ -498,6 +575,19 @@ def update_task_assignees(task: Dict[str, Any], assignee_ids: List[int], respons
         'responsible_name': responsible_name,
     }
 
+def copy_task_upload(src, dest: Path) -> int:
+    """Copy a spooled upload to dest with one buffered copy loop and return its size"""
+    # The upload is already spooled, so its size is known up front: oversized files are never written
+    size = src.seek(0, os.SEEK_END)
+    if size > TASK_FILE_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"File exceeds the {TASK_FILE_MAX_SIZE // (1024 * 1024)} MB limit")
+    src.seek(0)
+    # Created only once the size is accepted, so rejected uploads leave no empty directories behind
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with dest.open("wb") as buffer:
+        shutil.copyfileobj(src, buffer, TASK_UPLOAD_COPY_CHUNK)
+    return size
+
 async def save_task_file(task: Dict[str, Any], upload: UploadFile, user: Dict) -> Dict[str, Any]:
     if not upload.filename:
         raise HTTPException(status_code=400, detail="File name is required")
@@ -505,23 +595,12 @@ async def save_task_file(task: Dict[str, Any], upload: UploadFile, user: Dict) -
     safe_name = os.path.basename(upload.filename)
     file_id = str(uuid.uuid4())
     task_dir = TASK_UPLOAD_DIR / task['id']
-    task_dir.mkdir(parents=True, exist_ok=True)
 
     storage_name = f"{file_id}_{safe_name}"
     relative_path = Path(task['id']) / storage_name
     absolute_path = task_dir / storage_name
 
-    with open(absolute_path, "wb") as buffer:
-        while True:
-            chunk = await upload.read(1024 * 1024)
-            if not chunk:
-                break
-            buffer.write(chunk)
-
-    file_size = absolute_path.stat().st_size
-    if file_size > 50 * 1024 * 1024:
-        absolute_path.unlink(missing_ok=True)
-        raise HTTPException(status_code=400, detail="File exceeds the 50 MB limit")
+    file_size = await asyncio.to_thread(copy_task_upload, upload.file, absolute_path)
 
     user_id = user.get('id')
     user_name = user.get('username') or user.get('email')
@@ -558,14 +637,22 @@ async def save_task_file(task: Dict[str, Any], upload: UploadFile, user: Dict) -
         raise HTTPException(status_code=500, detail="Unable to load uploaded file metadata")
     return record
 
+def remove_stored_upload(absolute_path: Optional[Path]) -> None:
+    """Delete an attachment from disk; the row is already gone, so a failure is only logged"""
+    if absolute_path is None:
+        return
+    try:
+        absolute_path.unlink(missing_ok=True)
+    except OSError as e:
+        print(f"Warning: Could not delete attachment {absolute_path}: {e}")
+
 def delete_task_file(task: Dict[str, Any], record: Dict[str, Any], user: Dict) -> None:
     relative_path = record.get('storage_path')
     absolute_path = TASK_UPLOAD_DIR / relative_path if relative_path else None
 
     db.execute_update("DELETE FROM task_files WHERE id = %s", (record['id'],))
 
-    if absolute_path and absolute_path.exists():
-        absolute_path.unlink()
+    remove_stored_upload(absolute_path)
 
     log_task_event(
         task_id=task['id'],
@@ -584,23 +671,12 @@ async def save_timeline_file(entry_id: str, task_id: str, upload: UploadFile, us
     safe_name = os.path.basename(upload.filename)
     file_id = str(uuid.uuid4())
     entry_dir = TIMELINE_UPLOAD_DIR / task_id / entry_id
-    entry_dir.mkdir(parents=True, exist_ok=True)
 
     storage_name = f"{file_id}_{safe_name}"
     relative_path = Path(task_id) / entry_id / storage_name
     absolute_path = entry_dir / storage_name
 
-    with open(absolute_path, "wb") as buffer:
-        while True:
-            chunk = await upload.read(1024 * 1024)
-            if not chunk:
-                break
-            buffer.write(chunk)
-
-    file_size = absolute_path.stat().st_size
-    if file_size > 50 * 1024 * 1024:
-        absolute_path.unlink(missing_ok=True)
-        raise HTTPException(status_code=400, detail="File exceeds the 50 MB limit")
+    file_size = await asyncio.to_thread(copy_task_upload, upload.file, absolute_path)
 
     user_id = user.get('id')
     user_name = user.get('username') or user.get('email')
@@ -646,8 +722,6 @@ def normalize_checklist_item(item: Dict[str, Any]) -> Dict[str, Any]:
         normalized['assigned_to'] = None
     # Ensure parent_id is str or None
     normalized['parent_id'] = normalized.get('parent_id') or None
-    normalized['created_at'] = serialize_timestamp(normalized.get('created_at'))
-    normalized['updated_at'] = serialize_timestamp(normalized.get('updated_at'))
     return normalized
 
 def fetch_task_checklist(task_id: str) -> List[Dict[str, Any]]:
@@ -663,17 +737,56 @@ def fetch_task_checklist(task_id: str) -> List[Dict[str, Any]]:
     rows = db.execute_query(query, (task_id,))
     return [normalize_checklist_item(dict(row)) for row in rows]
 
+# Read caches for the tree and workflow steps, which every UI interaction fetches but only
+# the endpoints below change. Those endpoints drop the cache; the TTL bounds staleness from
+# writes made elsewhere (expired locks cleaned up on socket disconnect, workspace renames).
+TASK_CACHE_TTL = 15  # seconds
+_tree_cache: Dict[str, Tuple[float, Any]] = {}
+_workflow_steps_cache: Dict[str, Tuple[float, Any]] = {}
+_cache_epoch = 0  # bumped on every invalidation so a load that raced a write isn't stored
+
+async def get_cached(cache: Dict[str, Tuple[float, Any]], workspace_id: str, loader: Callable[[], Any]) -> Any:
+    """Return the cached value for a workspace, running the blocking loader in a worker thread on a miss"""
+    now = time.monotonic()
+    entry = cache.get(workspace_id)
+    if entry and entry[0] > now:
+        return entry[1]
+    epoch = _cache_epoch
+    value = await asyncio.to_thread(loader)
+    if epoch == _cache_epoch:
+        cache[workspace_id] = (now + TASK_CACHE_TTL, value)
+    return value
+
+def invalidate_task_tree_cache(workspace_id: Optional[str] = None):
+    """Forget cached trees for a workspace (all of them if none is given)"""
+    global _cache_epoch
+    _cache_epoch += 1
+    if workspace_id is None:
+        _tree_cache.clear()
+    else:
+        _tree_cache.pop(workspace_id, None)
+
+def invalidate_workflow_steps_cache(workspace_id: str):
+    """Forget the cached workflow steps of a workspace"""
+    global _cache_epoch
+    _cache_epoch += 1
+    _workflow_steps_cache.pop(workspace_id, None)
+
 # Endpoints
+def load_task_tree(workspace_id: str) -> bytes:
+    """Build the tree response body, encoded once so cache hits send the bytes as-is"""
+    tree = build_task_tree('root', workspace_id)
+    ws_query = "SELECT name FROM workspaces WHERE id = %s"
+    ws = db.execute_query(ws_query, (workspace_id,))
+    workspace_name = ws[0]['name'] if ws else 'Tasks'
+    return orjson.dumps({"success": True, "tree": tree, "workspace_name": workspace_name})
+
 @router.get("/tasks/tree")
 async def get_task_tree(workspace_id: str = 'demo', user: Dict = Depends(get_current_user)):
     """Get full task tree"""
     try:
-        tree = build_task_tree('root', workspace_id)
-        ws_query = "SELECT name FROM workspaces WHERE id = %s"
-        ws = db.execute_query(ws_query, (workspace_id,))
-        workspace_name = ws[0]['name'] if ws else 'Tasks'
-        
-        return {"success": True, "tree": tree, "workspace_name": workspace_name}
+        body = await get_cached(_tree_cache, workspace_id, lambda: load_task_tree(workspace_id))
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -690,9 +803,14 @@ async def reorder_tasks(data: dict = Body(...), user: Dict = Depends(get_current
         workspace_id = first_task.get('workspace_id', 'demo')
         await check_workspace_permission(workspace_id, user, 'write')
 
-        for index, task_id in enumerate(task_ids):
-            db.execute_update("UPDATE tasks SET sort_order = %s WHERE id = %s", (index, task_id))
+        # One connection and one commit for the whole sibling list; rows are bound one by one,
+        # so large lists never build an oversized IN (...) or CASE statement
+        await db.execute_batch(
+            "UPDATE tasks SET sort_order = %s WHERE id = %s",
+            [(index, task_id) for index, task_id in enumerate(task_ids)],
+        )
 
+        invalidate_task_tree_cache()
         await broadcast_task_tree_update()
         return {"success": True, "message": "Tasks reordered"}
     except HTTPException:
@@ -706,7 +824,7 @@ async def reorder_tasks(data: dict = Body(...), user: Dict = Depends(get_current
 async def get_kanban_order(workspace_id: str = "demo", user: Dict = Depends(get_current_user)):
     """Get kanban task ordering for all columns in a workspace"""
     try:
-        rows = db.execute_query(
+        rows = await db.fetch(
             "SELECT status_slug, task_id, sort_order FROM kanban_task_order WHERE workspace_id = %s ORDER BY status_slug, sort_order ASC",
             (workspace_id,),
         )
@@ -730,17 +848,18 @@ async def save_kanban_order(data: dict = Body(...), user: Dict = Depends(get_cur
         if not status_slug:
             raise HTTPException(status_code=400, detail="status_slug is required")
         await check_workspace_permission(workspace_id, user, 'write')
-        # Delete existing order for this column
-        db.execute_update(
-            "DELETE FROM kanban_task_order WHERE workspace_id = %s AND status_slug = %s",
-            (workspace_id, status_slug),
-        )
-        # Insert new order
-        for idx, task_id in enumerate(task_ids):
-            db.execute_update(
-                "INSERT INTO kanban_task_order (workspace_id, status_slug, task_id, sort_order) VALUES (%s, %s, %s, %s)",
-                (workspace_id, status_slug, task_id, idx),
+        async with db.transaction() as tx:
+            # Delete existing order for this column
+            await tx.execute(
+                "DELETE FROM kanban_task_order WHERE workspace_id = %s AND status_slug = %s",
+                (workspace_id, status_slug),
             )
+            # Insert new order (executemany sends multi-row INSERTs, split to fit the packet size)
+            if task_ids:
+                await tx.execute_many(
+                    "INSERT INTO kanban_task_order (workspace_id, status_slug, task_id, sort_order) VALUES (%s, %s, %s, %s)",
+                    [(workspace_id, status_slug, task_id, idx) for idx, task_id in enumerate(task_ids)],
+                )
         return {"success": True}
     except HTTPException:
         raise
@@ -779,7 +898,7 @@ async def get_workflow_steps(workspace_id: str = "demo", user: Dict = Depends(ge
     """Get workflow steps for a workspace (auto-seeds defaults if empty)."""
     try:
         await check_workspace_permission(workspace_id, user, "read")
-        steps = ensure_workflow_steps(workspace_id)
+        steps = await get_cached(_workflow_steps_cache, workspace_id, lambda: ensure_workflow_steps(workspace_id))
         return {"success": True, "steps": steps}
     except HTTPException:
         raise
@@ -815,6 +934,7 @@ async def create_workflow_step(data: dict = Body(...), user: Dict = Depends(get_
             "INSERT INTO workflow_steps (id, workspace_id, name, slug, color, sort_order) VALUES (%s, %s, %s, %s, %s, %s)",
             (step_id, workspace_id, name, slug, color, next_order),
         )
+        invalidate_workflow_steps_cache(workspace_id)
         step = {"id": step_id, "workspace_id": workspace_id, "name": name, "slug": slug, "color": color, "sort_order": next_order}
         return {"success": True, "step": step}
     except HTTPException:
@@ -861,6 +981,8 @@ async def update_workflow_step(step_id: str, data: dict = Body(...), user: Dict
                     "UPDATE tasks SET status = %s WHERE status = %s AND workspace_id = %s",
                     (updated[0]["slug"], old_slug, step["workspace_id"]),
                 )
+                invalidate_task_tree_cache(step["workspace_id"])
+            invalidate_workflow_steps_cache(step["workspace_id"])
 
         final = db.execute_query(
             "SELECT id, workspace_id, name, slug, color, sort_order FROM workflow_steps WHERE id = %s", (step_id,)
@@ -901,6 +1023,8 @@ async def delete_workflow_step(step_id: str, user: Dict = Depends(get_current_us
             )
 
         db.execute_update("DELETE FROM workflow_steps WHERE id = %s", (step_id,))
+        invalidate_workflow_steps_cache(workspace_id)
+        invalidate_task_tree_cache()
         await broadcast_task_tree_update()
         return {"success": True, "message": "Workflow step deleted"}
     except HTTPException:
@@ -917,8 +1041,11 @@ async def reorder_workflow_steps(data: dict = Body(...), user: Dict = Depends(ge
         if not step_ids:
             raise HTTPException(status_code=400, detail="step_ids is required")
         await check_workspace_permission(workspace_id, user, "write")
-        for index, sid in enumerate(step_ids):
-            db.execute_update("UPDATE workflow_steps SET sort_order = %s WHERE id = %s", (index, sid))
+        await db.execute_batch(
+            "UPDATE workflow_steps SET sort_order = %s WHERE id = %s",
+            [(index, sid) for index, sid in enumerate(step_ids)],
+        )
+        invalidate_workflow_steps_cache(workspace_id)
         return {"success": True, "message": "Workflow steps reordered"}
     except HTTPException:
         raise
@@ -929,19 +1056,11 @@ async def reorder_workflow_steps(data: dict = Body(...), user: Dict = Depends(ge
 async def get_task(task_id: str, user: Dict = Depends(get_current_user)):
     """Get single task"""
     try:
-        query = "SELECT * FROM tasks WHERE id = %s"
-        tasks = db.execute_query(query, (task_id,))
+        task = await db.fetch_one("SELECT * FROM tasks WHERE id = %s", (task_id,))
         
-        if not tasks:
+        if not task:
             raise HTTPException(status_code=404, detail="Task not found")
-        
-        task = dict(tasks[0])
-        if task.get('created_at'):
-            task['created_at'] = task['created_at'].isoformat()
-        if task.get('updated_at'):
-            task['updated_at'] = task['updated_at'].isoformat()
-        if task.get('due_date'):
-            task['due_date'] = task['due_date'].isoformat()
+
         if task.get('responsible_user_id') is not None:
             try:
                 task['responsible_user_id'] = int(task['responsible_user_id'])
@@ -959,39 +1078,44 @@ async def create_task(task: TaskBase, user: Dict = Depends(get_current_user)):
     """Create new task or folder (requires write permission)"""
     try:
         await check_workspace_permission(task.workspace_id, user, 'write')
-        task_id = str(uuid.uuid4())
+        task_id = uuid7()
         
         query = """
             INSERT INTO tasks (id, name, type, parent_id, content, workspace_id, user_id, status, priority, assigned_to, due_date)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         """
-        db.execute_update(query, (
-            task_id, task.name, task.type, task.parent_id, task.content,
-            task.workspace_id, user['id'], task.status, task.priority, task.assigned_to, task.due_date
-        ))
-        
-        if task.type == 'task':
-            log_task_event(
-                task_id=task_id,
-                event_type='created',
-                title='Task created',
-                description=f'Task "{task.name}" created',
-                metadata={
-                    "status": task.status,
-                    "priority": task.priority,
-                    "assigned_to": task.assigned_to,
-                    "due_date": task.due_date,
-                },
-                user=user,
-            )
+        async with db.transaction() as tx:
+            await tx.execute(query, (
+                task_id, task.name, task.type, task.parent_id, task.content,
+                task.workspace_id, user['id'], task.status, task.priority, task.assigned_to, task.due_date
+            ))
+
+            if task.type == 'task':
+                await tx.execute(TIMELINE_INSERT_SQL, timeline_event_row(
+                    task_id=task_id,
+                    event_type='created',
+                    title='Task created',
+                    description=f'Task "{task.name}" created',
+                    metadata={
+                        "status": task.status,
+                        "priority": task.priority,
+                        "assigned_to": task.assigned_to,
+                        "due_date": task.due_date,
+                    },
+                    user=user,
+                ))
 
         # Broadcast tree update to all clients
+        invalidate_task_tree_cache()
         await broadcast_task_tree_update()
 
-        return {"success": True, "task": {"id": task_id, **task.dict()}}
+        return {"success": True, "task": {"id": task_id, **task.model_dump()}}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Columns PUT /tasks/{id} may change, in the order they appear in the generated UPDATE
+TASK_UPDATE_COLUMNS = ('name', 'content', 'parent_id', 'status', 'priority', 'assigned_to', 'due_date')
+
 @router.put("/tasks/{task_id}")
 async def update_task(task_id: str, task: TaskUpdate, user: Dict = Depends(get_current_user)):
     """Update task (requires write permission)"""
@@ -1000,90 +1124,73 @@ async def update_task(task_id: str, task: TaskUpdate, user: Dict = Depends(get_c
         workspace_id = current_task.get('workspace_id', 'demo')
         await check_workspace_permission(workspace_id, user, 'write')
 
-        updates = []
-        params = []
-        payload = task.dict(exclude_unset=True)
-
-        if "name" in payload:
-            updates.append("name = %s")
-            params.append(payload["name"])
-        if "content" in payload:
-            updates.append("content = %s")
-            params.append(payload["content"])
-        if "parent_id" in payload:
-            updates.append("parent_id = %s")
-            params.append(payload["parent_id"])
-        if "status" in payload:
-            updates.append("status = %s")
-            params.append(payload["status"])
-        if "priority" in payload:
-            updates.append("priority = %s")
-            params.append(payload["priority"])
-        if "assigned_to" in payload:
-            updates.append("assigned_to = %s")
-            params.append(payload["assigned_to"])
-        if "due_date" in payload:
-            updates.append("due_date = %s")
-            params.append(payload["due_date"])
+        payload = task.model_dump(exclude_unset=True)
+        columns = tuple(column for column in TASK_UPDATE_COLUMNS if column in payload)
         
-        if not updates:
+        if not columns:
             return {"success": True, "message": "No changes"}
         
-        params.append(task_id)
-        query = f"UPDATE tasks SET {', '.join(updates)} WHERE id = %s"
-        db.execute_update(query, tuple(params))
+        query = build_update_sql('tasks', columns, 'id = %s')
+        params = (*(payload[column] for column in columns), task_id)
 
+        events: List[Tuple] = []
         if current_task['type'] == 'task':
             if "name" in payload and payload["name"] != current_task["name"]:
-                log_task_event(
+                events.append(timeline_event_row(
                     task_id,
                     "renamed",
                     "Task renamed",
                     f'"{current_task["name"]}" → "{payload["name"]}"',
                     {"from": current_task["name"], "to": payload["name"]},
                     user,
-                )
+                ))
             if "status" in payload and payload["status"] != current_task.get("status"):
-                log_task_event(
+                events.append(timeline_event_row(
                     task_id,
                     "status_changed",
                     "Status updated",
                     f'{current_task.get("status") or "unknown"} → {payload["status"]}',
                     {"from": current_task.get("status"), "to": payload["status"]},
                     user,
-                )
+                ))
             if "priority" in payload and payload["priority"] != current_task.get("priority"):
-                log_task_event(
+                events.append(timeline_event_row(
                     task_id,
                     "priority_changed",
                     "Priority updated",
                     f'{current_task.get("priority") or "unknown"} → {payload["priority"]}',
                     {"from": current_task.get("priority"), "to": payload["priority"]},
                     user,
-                )
+                ))
             if "assigned_to" in payload and payload["assigned_to"] != current_task.get("assigned_to"):
-                log_task_event(
+                events.append(timeline_event_row(
                     task_id,
                     "assignee_changed",
                     "Assignee updated",
                     f'{current_task.get("assigned_to") or "Unassigned"} → {payload["assigned_to"] or "Unassigned"}',
                     {"from": current_task.get("assigned_to"), "to": payload["assigned_to"]},
                     user,
-                )
+                ))
             if "due_date" in payload:
                 current_due = current_task.get("due_date")
                 current_due_formatted = current_due.isoformat() if isinstance(current_due, datetime) else current_due
                 if payload["due_date"] != current_due_formatted:
-                    log_task_event(
+                    events.append(timeline_event_row(
                         task_id,
                         "due_date_changed",
                         "Due date updated",
                         f'{current_due_formatted or "None"} → {payload["due_date"] or "None"}',
                         {"from": current_due_formatted, "to": payload["due_date"]},
                         user,
-                    )
+                    ))
+
+        async with db.transaction() as tx:
+            await tx.execute(query, params)
+            if events:
+                await tx.execute_many(TIMELINE_INSERT_SQL, events)
         
         # Broadcast tree update to all clients
+        invalidate_task_tree_cache()
         await broadcast_task_tree_update()
         await broadcast_task_activity_update(task_id)
         
@@ -1100,19 +1207,18 @@ async def delete_task(task_id: str, user: Dict = Depends(get_current_user)):
         if task_id == 'root':
             raise HTTPException(status_code=400, detail="Cannot delete root")
         
-        # Get task to check workspace and permissions
-        task = ensure_task_exists(task_id)
-        workspace_id = task.get('workspace_id', 'demo')
-        
-        # Check write permission
-        await check_workspace_permission(workspace_id, user, 'write')
-        
-        db.execute_update("DELETE FROM tasks WHERE id = %s", (task_id,))
+        # Permission check is part of the DELETE; only a miss costs a second query
+        guard, guard_params = write_guard(user)
+        deleted = db.execute_update(f"DELETE FROM tasks WHERE id = %s{guard}", (task_id, *guard_params))
+        if not deleted:
+            await explain_unmatched_write(task_id, user)
+            raise HTTPException(status_code=404, detail="Task not found")
         task_dir = TASK_UPLOAD_DIR / task_id
         if task_dir.exists():
             shutil.rmtree(task_dir, ignore_errors=True)
         
         # Broadcast tree update to all clients
+        invalidate_task_tree_cache()
         await broadcast_task_tree_update()
         
         return {"success": True, "message": "Task deleted"}
@@ -1125,15 +1231,22 @@ async def delete_task(task_id: str, user: Dict = Depends(get_current_user)):
 async def move_task(task_id: str, move_data: TaskMove, user: Dict = Depends(get_current_user)):
     """Move task to new parent (requires write permission)"""
     try:
-        task = ensure_task_exists(task_id)
-        workspace_id = task.get('workspace_id', 'demo')
-        await check_workspace_permission(workspace_id, user, 'write')
-        db.execute_update("UPDATE tasks SET parent_id = %s WHERE id = %s", (move_data.parent_id, task_id))
+        guard, guard_params = write_guard(user)
+        moved = db.execute_update(
+            f"UPDATE tasks SET parent_id = %s WHERE id = %s{guard}",
+            (move_data.parent_id, task_id, *guard_params)
+        )
+        if not moved:
+            # Missing, forbidden, or already under that parent (unchanged rows aren't counted)
+            await explain_unmatched_write(task_id, user)
         
         # Broadcast tree update to all clients
+        invalidate_task_tree_cache()
         await broadcast_task_tree_update()
         
         return {"success": True, "message": "Task moved"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1141,31 +1254,28 @@ async def move_task(task_id: str, move_data: TaskMove, user: Dict = Depends(get_
 async def copy_task(task_id: str, user: Dict = Depends(get_current_user)):
     """Copy task (requires write permission)"""
     try:
-        query = "SELECT * FROM tasks WHERE id = %s"
-        tasks = db.execute_query(query, (task_id,))
-        
-        if not tasks:
-            raise HTTPException(status_code=404, detail="Task not found")
+        new_id = uuid7()
         
-        task = tasks[0]
-        workspace_id = task.get('workspace_id', 'demo')
-        await check_workspace_permission(workspace_id, user, 'write')
-        new_id = str(uuid.uuid4())
-        
-        query = """
+        # Copy the row inside MySQL; the permission check is part of the SELECT
+        guard, guard_params = write_guard(user)
+        query = f"""
             INSERT INTO tasks (id, name, type, parent_id, content, workspace_id, user_id, status, priority, assigned_to, due_date)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            SELECT %s, CONCAT(name, ' (copy)'), type, parent_id, content, workspace_id, %s, status, priority, assigned_to, due_date
+            FROM tasks
+            WHERE id = %s{guard}
         """
-        db.execute_update(query, (
-            new_id, f"{task['name']} (copy)", task['type'], task['parent_id'],
-            task['content'], task['workspace_id'], user['id'],
-            task['status'], task['priority'], task['assigned_to'], task['due_date']
-        ))
+        copied = db.execute_update(query, (new_id, user['id'], task_id, *guard_params))
+        if not copied:
+            await explain_unmatched_write(task_id, user)
+            raise HTTPException(status_code=404, detail="Task not found")
         
         # Broadcast tree update to all clients
+        invalidate_task_tree_cache()
         await broadcast_task_tree_update()
         
         return {"success": True, "task_id": new_id}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1176,7 +1286,7 @@ async def list_tags(query: Optional[str] = None, limit: int = 50, user: Dict = D
         limit = max(1, min(limit, 100))
         if query:
             search = f"%{query.strip()}%"
-            rows = db.execute_query(
+            rows = await db.fetch(
                 """
                 SELECT id, name FROM tags
                 WHERE LOWER(name) LIKE LOWER(%s)
@@ -1186,7 +1296,7 @@ async def list_tags(query: Optional[str] = None, limit: int = 50, user: Dict = D
                 (search, limit)
             )
         else:
-            rows = db.execute_query(
+            rows = await db.fetch(
                 "SELECT id, name FROM tags ORDER BY name LIMIT %s",
                 (limit,)
             )
@@ -1197,10 +1307,10 @@ async def list_tags(query: Optional[str] = None, limit: int = 50, user: Dict = D
 @router.get("/tasks/{task_id}/tags")
 async def get_task_tags(task_id: str, user: Dict = Depends(get_current_user)):
     """Get tags associated with a task"""
-    task = ensure_task_exists(task_id)
+    task = await asyncio.to_thread(ensure_task_exists, task_id)
     if task['type'] != 'task':
         raise HTTPException(status_code=400, detail="Tags are only available for tasks")
-    tags = fetch_task_tags(task_id)
+    tags = await asyncio.to_thread(fetch_task_tags, task_id)
     return {"success": True, "tags": tags}
 
 @router.put("/tasks/{task_id}/tags")
@@ -1212,6 +1322,7 @@ async def update_task_tags_endpoint(task_id: str, payload: TagsUpdate, user: Dic
     tags = update_task_tags(task, payload.tags, user)
     
     # Broadcast tree update to all clients
+    invalidate_task_tree_cache()
     await broadcast_task_tree_update()
     await broadcast_task_activity_update(task_id)
     
@@ -1220,8 +1331,8 @@ async def update_task_tags_endpoint(task_id: str, payload: TagsUpdate, user: Dic
 @router.get("/tasks/{task_id}/assignees")
 async def get_task_assignees(task_id: str, user: Dict = Depends(get_current_user)):
     """Get task assignees and responsible"""
-    task = ensure_task_exists(task_id)
-    assignees = fetch_task_assignees(task_id)
+    task = await asyncio.to_thread(ensure_task_exists, task_id)
+    assignees = await asyncio.to_thread(fetch_task_assignees, task_id)
     return {
         "success": True,
         "assignees": assignees,
@@ -1235,9 +1346,10 @@ async def update_task_assignees_endpoint(task_id: str, payload: AssigneesUpdate,
     task = ensure_task_exists(task_id)
     if task['type'] != 'task':
         raise HTTPException(status_code=400, detail="Assignments are only available for tasks")
-    result = update_task_assignees(task, payload.assignee_ids, payload.responsible_id, user)
+    result = await update_task_assignees(task, payload.assignee_ids, payload.responsible_id, user)
     
     # Broadcast tree update to all clients
+    invalidate_task_tree_cache()
     await broadcast_task_tree_update()
     await broadcast_task_activity_update(task_id)
     
@@ -1246,10 +1358,10 @@ async def update_task_assignees_endpoint(task_id: str, payload: AssigneesUpdate,
 @router.get("/tasks/{task_id}/files")
 async def list_task_files(task_id: str, user: Dict = Depends(get_current_user)):
     """List files attached to a task"""
-    task = ensure_task_exists(task_id)
+    task = await asyncio.to_thread(ensure_task_exists, task_id)
     if task['type'] != 'task':
         raise HTTPException(status_code=400, detail="Files are only available for tasks")
-    files = fetch_task_files(task_id)
+    files = await asyncio.to_thread(fetch_task_files, task_id)
     return {"success": True, "files": files}
 
 @router.post("/tasks/{task_id}/files")
@@ -1305,7 +1417,7 @@ async def delete_task_file_endpoint(task_id: str, file_id: str, user: Dict = Dep
     record = get_task_file_record(task_id, file_id)
     if not record:
         raise HTTPException(status_code=404, detail="File not found")
-    delete_task_file(task, record, user)
+    await asyncio.to_thread(delete_task_file, task, record, user)
     
     # Broadcast activity update to all clients
     await broadcast_task_activity_update(task_id)
@@ -1316,7 +1428,7 @@ async def delete_task_file_endpoint(task_id: str, file_id: str, user: Dict = Dep
 @router.get("/tasks/{task_id}/timeline")
 async def get_task_timeline(task_id: str, limit: int = 200, user: Dict = Depends(get_current_user)):
     """Get task timeline"""
-    ensure_task_exists(task_id)
+    await asyncio.to_thread(ensure_task_exists, task_id)
     query = """
         SELECT id, task_id, event_type, title, description, metadata, user_id, user_name, created_at
         FROM task_timeline
@@ -1324,8 +1436,8 @@ async def get_task_timeline(task_id: str, limit: int = 200, user: Dict = Depends
         ORDER BY created_at DESC
         LIMIT %s
     """
-    timeline = db.execute_query(query, (task_id, limit))
-    items = [serialize_timeline_entry(dict(entry)) for entry in timeline]
+    timeline = await db.fetch(query, (task_id, limit))
+    items = await asyncio.to_thread(lambda: [serialize_timeline_entry(dict(entry)) for entry in timeline])
     return {"success": True, "timeline": items}
 
 @router.post("/tasks/{task_id}/timeline")
@@ -1344,20 +1456,14 @@ async def add_task_timeline_entry(task_id: str, entry: TimelineEntryCreate, user
 
     event_type = (entry.event_type or 'note').strip().lower()
 
-    entry_id = log_task_event(
-        task_id=task_id,
-        event_type=event_type,
-        title=title,
-        description=description,
-        user=user,
-    )
+    row = timeline_event_row(task_id, event_type, title, description, user=user)
 
     query = """
         SELECT id, task_id, event_type, title, description, metadata, user_id, user_name, created_at
         FROM task_timeline
         WHERE id = %s
     """
-    rows = db.execute_query(query, (entry_id,))
+    rows = await db.returning(TIMELINE_INSERT_SQL, row, query, (row[0],))
     if not rows:
         raise HTTPException(status_code=500, detail="Failed to load created timeline entry")
     
@@ -1485,10 +1591,9 @@ async def delete_timeline_file(task_id: str, entry_id: str, file_id: str, user:
     relative_path = record.get('storage_path')
     absolute_path = TIMELINE_UPLOAD_DIR / relative_path if relative_path else None
 
-    db.execute_update("DELETE FROM task_timeline_files WHERE id = %s AND timeline_entry_id = %s", (file_id, entry_id))
+    await db.execute("DELETE FROM task_timeline_files WHERE id = %s AND timeline_entry_id = %s", (file_id, entry_id))
 
-    if absolute_path and absolute_path.exists():
-        absolute_path.unlink()
+    await asyncio.to_thread(remove_stored_upload, absolute_path)
     
     # Broadcast activity update
     await broadcast_task_activity_update(task_id)
@@ -1498,7 +1603,7 @@ async def delete_timeline_file(task_id: str, entry_id: str, file_id: str, user:
 @router.get("/tasks/{task_id}/comments")
 async def get_task_comments(task_id: str, limit: int = 200, user: Dict = Depends(get_current_user)):
     """Get task comments"""
-    ensure_task_exists(task_id)
+    await asyncio.to_thread(ensure_task_exists, task_id)
     query = """
         SELECT id, task_id, user_id, user_name, content, created_at
         FROM task_comments
@@ -1506,8 +1611,8 @@ async def get_task_comments(task_id: str, limit: int = 200, user: Dict = Depends
         ORDER BY created_at ASC
         LIMIT %s
     """
-    comments = db.execute_query(query, (task_id, limit))
-    items = [serialize_comment(dict(comment)) for comment in comments]
+    comments = await db.fetch(query, (task_id, limit))
+    items = [dict(comment) for comment in comments]
     return {"success": True, "comments": items}
 
 @router.post("/tasks/{task_id}/comments")
@@ -1529,88 +1634,78 @@ async def add_task_comment(task_id: str, comment: TaskCommentCreate, user: Dict
         INSERT INTO task_comments (id, task_id, user_id, user_name, content)
         VALUES (%s, %s, %s, %s, %s)
     """
-    db.execute_update(query, (comment_id, task_id, user_id, user_name, content))
-
     fetch_query = """
         SELECT id, task_id, user_id, user_name, content, created_at
         FROM task_comments
         WHERE id = %s
     """
-    rows = db.execute_query(fetch_query, (comment_id,))
+    # No RETURNING in MySQL: insert and re-select on one connection with a single commit
+    rows = await db.returning(query, (comment_id, task_id, user_id, user_name, content), fetch_query, (comment_id,))
     if not rows:
         raise HTTPException(status_code=500, detail="Failed to load created comment")
 
     # Broadcast activity update to all clients
     await broadcast_task_activity_update(task_id)
 
-    return {"success": True, "comment": serialize_comment(dict(rows[0]))}
+    return {"success": True, "comment": dict(rows[0])}
 
 @router.patch("/tasks/{task_id}/comments/{comment_id}")
 async def update_task_comment(task_id: str, comment_id: str, comment: TaskCommentUpdate, user: Dict = Depends(get_current_user)):
     """Update a comment (only by the creator)"""
-    task = ensure_task_exists(task_id)
-    
-    # Get the comment to check ownership
-    check_query = """
-        SELECT id, user_id, content FROM task_comments
-        WHERE id = %s AND task_id = %s
-    """
-    existing = db.execute_query(check_query, (comment_id, task_id))
-    if not existing:
-        raise HTTPException(status_code=404, detail="Comment not found")
-    
-    # Check if user is the creator
-    if existing[0]['user_id'] != user.get('id'):
-        raise HTTPException(status_code=403, detail="You can only edit your own comments")
-    
     content = comment.content.strip()
     if not content:
         raise HTTPException(status_code=400, detail="Comment cannot be empty")
     
-    # Update the comment
+    # Ownership is part of the UPDATE; the re-select tells a foreign comment from a missing one
     update_query = """
         UPDATE task_comments
         SET content = %s
-        WHERE id = %s AND task_id = %s
+        WHERE id = %s AND task_id = %s AND user_id = %s
     """
-    db.execute_update(update_query, (content, comment_id, task_id))
-    
-    # Fetch updated comment
     fetch_query = """
         SELECT id, task_id, user_id, user_name, content, created_at
         FROM task_comments
-        WHERE id = %s
+        WHERE id = %s AND task_id = %s
     """
-    rows = db.execute_query(fetch_query, (comment_id,))
+    rows = await db.returning(update_query, (content, comment_id, task_id, user.get('id')),
+                              fetch_query, (comment_id, task_id))
     if not rows:
-        raise HTTPException(status_code=500, detail="Failed to load updated comment")
+        ensure_task_exists(task_id)
+        raise HTTPException(status_code=404, detail="Comment not found")
+    
+    # Check if user is the creator
+    if rows[0]['user_id'] != user.get('id'):
+        raise HTTPException(status_code=403, detail="You can only edit your own comments")
     
     # Broadcast activity update
     await broadcast_task_activity_update(task_id)
     
-    return {"success": True, "comment": serialize_comment(dict(rows[0]))}
+    return {"success": True, "comment": dict(rows[0])}
 
 @router.delete("/tasks/{task_id}/comments/{comment_id}")
 async def delete_task_comment(task_id: str, comment_id: str, user: Dict = Depends(get_current_user)):
     """Delete a comment (only by the creator)"""
-    task = ensure_task_exists(task_id)
-    
-    # Get the comment to check ownership
-    check_query = """
-        SELECT id, user_id FROM task_comments
-        WHERE id = %s AND task_id = %s
-    """
-    existing = db.execute_query(check_query, (comment_id, task_id))
-    if not existing:
-        raise HTTPException(status_code=404, detail="Comment not found")
-    
-    # Check if user is the creator
-    if existing[0]['user_id'] != user.get('id'):
+    # Ownership is part of the DELETE; only a miss costs one lookup to pick 404 or 403
+    deleted = await db.execute(
+        "DELETE FROM task_comments WHERE id = %s AND task_id = %s AND user_id = %s",
+        (comment_id, task_id, user.get('id'))
+    )
+    if not deleted:
+        existing = await db.fetch_one(
+            """
+            SELECT c.id AS comment_id
+            FROM tasks t
+            LEFT JOIN task_comments c ON c.id = %s AND c.task_id = t.id
+            WHERE t.id = %s
+            """,
+            (comment_id, task_id)
+        )
+        if not existing:
+            raise HTTPException(status_code=404, detail="Task not found")
+        if existing['comment_id'] is None:
+            raise HTTPException(status_code=404, detail="Comment not found")
         raise HTTPException(status_code=403, detail="You can only delete your own comments")
     
-    # Delete the comment
-    db.execute_update("DELETE FROM task_comments WHERE id = %s AND task_id = %s", (comment_id, task_id))
-    
     # Broadcast activity update
     await broadcast_task_activity_update(task_id)
     
@@ -1619,28 +1714,31 @@ async def delete_task_comment(task_id: str, comment_id: str, user: Dict = Depend
 @router.delete("/tasks/{task_id}/timeline/{entry_id}")
 async def delete_task_timeline_entry(task_id: str, entry_id: str, user: Dict = Depends(get_current_user)):
     """Delete a timeline entry (only by the creator, and only manual notes)"""
-    task = ensure_task_exists(task_id)
-    
-    # Get the entry to check ownership and type
-    check_query = """
-        SELECT id, user_id, event_type FROM task_timeline
-        WHERE id = %s AND task_id = %s
-    """
-    existing = db.execute_query(check_query, (entry_id, task_id))
-    if not existing:
-        raise HTTPException(status_code=404, detail="Timeline entry not found")
-    
-    # Only allow deleting manual notes
-    if existing[0]['event_type'] != 'note':
-        raise HTTPException(status_code=400, detail="Only manual notes can be deleted")
-    
-    # Check if user is the creator
-    if existing[0]['user_id'] != user.get('id'):
+    # Ownership and type are part of the DELETE (CASCADE will handle files);
+    # only a miss costs one lookup to pick the error
+    deleted = await db.execute(
+        "DELETE FROM task_timeline WHERE id = %s AND task_id = %s AND user_id = %s AND event_type = 'note'",
+        (entry_id, task_id, user.get('id'))
+    )
+    if not deleted:
+        existing = await db.fetch_one(
+            """
+            SELECT e.id AS entry_id, e.user_id, e.event_type
+            FROM tasks t
+            LEFT JOIN task_timeline e ON e.id = %s AND e.task_id = t.id
+            WHERE t.id = %s
+            """,
+            (entry_id, task_id)
+        )
+        if not existing:
+            raise HTTPException(status_code=404, detail="Task not found")
+        if existing['entry_id'] is None:
+            raise HTTPException(status_code=404, detail="Timeline entry not found")
+        # Only allow deleting manual notes
+        if existing['event_type'] != 'note':
+            raise HTTPException(status_code=400, detail="Only manual notes can be deleted")
         raise HTTPException(status_code=403, detail="You can only delete your own timeline entries")
     
-    # Delete the entry (CASCADE will handle files)
-    db.execute_update("DELETE FROM task_timeline WHERE id = %s AND task_id = %s", (entry_id, task_id))
-    
     # Broadcast activity update
     await broadcast_task_activity_update(task_id)
     
@@ -1668,6 +1766,7 @@ async def lock_task(task_id: str, lock_req: LockRequest):
         db.execute_update(query, (task_id, lock_req.user_id, lock_req.user_name))
         
         # Broadcast lock update to all clients
+        invalidate_task_tree_cache()
         await broadcast_task_lock_update(task_id, {'user_id': lock_req.user_id, 'user_name': lock_req.user_name})
         
         return {"success": True, "message": "Task locked"}
@@ -1681,6 +1780,7 @@ async def unlock_task(task_id: str, user_id: str):
         db.execute_update("DELETE FROM task_locks WHERE task_id = %s AND user_id = %s", (task_id, user_id))
         
         # Broadcast lock update to all clients
+        invalidate_task_tree_cache()
         await broadcast_task_lock_update(task_id, None)
         
         return {"success": True, "message": "Task unlocked"}
@@ -1714,10 +1814,10 @@ async def heartbeat_task(task_id: str, user: Dict = Depends(get_current_user)):
 @router.get("/tasks/{task_id}/checklist")
 async def get_task_checklist(task_id: str, user: Dict = Depends(get_current_user)):
     """Get checklist items for a task"""
-    task = ensure_task_exists(task_id)
+    task = await asyncio.to_thread(ensure_task_exists, task_id)
     if task['type'] != 'task':
         raise HTTPException(status_code=400, detail="Checklist is only available for tasks")
-    items = fetch_task_checklist(task_id)
+    items = await asyncio.to_thread(fetch_task_checklist, task_id)
     return {"success": True, "items": items}
 
 @router.post("/tasks/{task_id}/checklist")
@@ -1731,20 +1831,16 @@ async def add_task_checklist_item(task_id: str, item: ChecklistItemCreate, user:
     if not text:
         raise HTTPException(status_code=400, detail="Text cannot be empty")
     
-    # Get max order for this task
-    max_order_query = "SELECT MAX(`order`) as max_order FROM task_checklist WHERE task_id = %s"
-    max_order_result = db.execute_query(max_order_query, (task_id,))
-    max_order = max_order_result[0]['max_order'] if max_order_result and max_order_result[0]['max_order'] is not None else -1
-    new_order = max_order + 1
-    
+    # Append after the current last item; the next order is computed by the INSERT itself
     item_id = str(uuid.uuid4())
     query = """
         INSERT INTO task_checklist (id, task_id, text, completed, `order`, assigned_to, parent_id)
-        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        SELECT %s, %s, %s, %s, COALESCE(MAX(`order`), -1) + 1, %s, %s
+        FROM task_checklist
+        WHERE task_id = %s
     """
-    db.execute_update(query, (item_id, task_id, text, False, new_order, item.assigned_to, item.parent_id))
     
-    # Fetch created item
+    # Fetch created item on the same connection (MySQL has no RETURNING)
     fetch_query = """
         SELECT c.id, c.task_id, c.text, c.completed, c.`order`, c.assigned_to, c.parent_id,
                c.created_at, c.updated_at, u.username AS assigned_username
@@ -1752,7 +1848,10 @@ async def add_task_checklist_item(task_id: str, item: ChecklistItemCreate, user:
         LEFT JOIN users u ON c.assigned_to = u.id
         WHERE c.id = %s
     """
-    rows = db.execute_query(fetch_query, (item_id,))
+    rows = await db.returning(
+        query, (item_id, task_id, text, False, item.assigned_to, item.parent_id, task_id),
+        fetch_query, (item_id,),
+    )
     if not rows:
         raise HTTPException(status_code=500, detail="Failed to load created checklist item")
     
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, Request, Depends, Query, Request a
 from pydantic import BaseModel
 from typing import Optional, Dict, List, Any
 from database import db
+from permission_cache import get_cached_permission
 from encryption_service import encryption
 from websocket_broadcasts import broadcast_vault_tree_update, broadcast_vault_item_updated, broadcast_vault_lock_update
 import uuid
@@ -193,6 +194,11 @@ def get_workspace_permission(user_id: int, workspace_id: str, user_role: str = N
     if user_role == 'admin':
         return 'admin'
     
+    return get_cached_permission('vault', user_id, workspace_id,
+                                 lambda: load_workspace_permission(user_id, workspace_id))
+
+def load_workspace_permission(user_id: int, workspace_id: str) -> str:
+    """Resolve user permission for workspace from the database"""
     # Also check in database if role not provided
     user_query = "SELECT role FROM users WHERE id = %s"
     user_result = db.execute_query(user_query, (user_id,))
@@ -1,37 +1,62 @@
 # Shared WebSocket broadcast functions for all modules
 # This file provides harmonized broadcasting functions for Documents, Tasks, and Passwords
 
+import asyncio
+import logging
 from typing import Optional, Dict
 
+log = logging.getLogger(__name__)
+
 # Socket.IO instance will be set by main.py
 sio = None
 
+# Upper bound on how long a broadcast may hold up its caller
+BROADCAST_TIMEOUT = 2.0
+
 def set_sio(sio_instance):
     """Set the Socket.IO instance (called from main.py)"""
     global sio
     sio = sio_instance
 
+async def _emit(*events):
+    """Emit (event, payload) pairs concurrently, giving up after BROADCAST_TIMEOUT"""
+    # sio.emit already encodes each packet once and fans out to clients in parallel
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(*(sio.emit(event, payload) for event, payload in events), return_exceptions=True),
+            timeout=BROADCAST_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        log.warning("Broadcast of %s timed out", ', '.join(event for event, _ in events))
+        return
+    for (event, _), result in zip(events, results):
+        if isinstance(result, Exception):
+            log.warning("Broadcast of %s failed", event, exc_info=result)
+
 # ===== Documents Module =====
 
 async def broadcast_document_tree_update():
     """Broadcast document tree update signal to all connected clients"""
     if sio:
-        await sio.emit('document_tree_changed', {'action': 'reload'})
-        # Also emit legacy event for backward compatibility
-        await sio.emit('tree_changed', {'action': 'reload'})
+        payload = {'action': 'reload'}
+        await _emit(
+            ('document_tree_changed', payload),
+            # Also emit legacy event for backward compatibility
+            ('tree_changed', payload),
+        )
 
 async def broadcast_document_lock_update(document_id: str, lock_info: Optional[Dict] = None):
     """Broadcast document lock status change"""
     if sio:
-        await sio.emit('document_lock_updated', {
+        payload = {
             'document_id': document_id,
             'locked_by': lock_info
-        })
-        # Also emit legacy event for backward compatibility
-        await sio.emit('lock_updated', {
-            'document_id': document_id,
-            'locked_by': lock_info
-        })
+        }
+        await _emit(
+            ('document_lock_updated', payload),
+            # Also emit legacy event for backward compatibility
+            ('lock_updated', payload),
+        )
 
 async def broadcast_document_content_updated(document_id: str, name: Optional[str] = None, user_id: Optional[int] = None):
     """Broadcast document content update"""
@@ -127,20 +152,20 @@ async def broadcast_file_content_updated(file_id: str, name: Optional[str] = Non
 async def broadcast_schema_tree_update():
     """Broadcast schema tree update signal to all connected clients"""
     if sio:
-        await sio.emit('schema_tree_changed', {'action': 'reload'})
+        await _emit(('schema_tree_changed', {'action': 'reload'}))
 
 async def broadcast_schema_lock_update(schema_id: str, lock_info: Optional[Dict] = None):
     """Broadcast schema lock status change"""
     if sio:
-        await sio.emit('schema_lock_updated', {
+        await _emit(('schema_lock_updated', {
             'schema_id': schema_id,
             'locked_by': lock_info
-        })
+        }))
 
 async def broadcast_schema_content_updated(schema_id: str, user_id: Optional[int] = None):
     """Broadcast schema content update (devices, connections)"""
     if sio:
-        await sio.emit('schema_content_updated', {
+        await _emit(('schema_content_updated', {
             'schema_id': schema_id,
             'user_id': user_id
-        })
+        }))
@@ -73,7 +73,7 @@ const DevicePropertiesPanel: React.FC<DevicePropertiesPanelProps> = ({
         position_x: formData.position_x,
         position_y: formData.position_y,
         config_json: configJson,
-      });
+      }, 'full');
 
       if (result.success && result.device) {
         onUpdate(result.device);
@@ -650,8 +650,8 @@ class ApiService {
     ip_address?: string;
     mac_address?: string;
     config_json?: Record<string, any>;
-  }): Promise<{ success: boolean; device: Device }> {
-    return this.request(`/schemas/${schemaId}/devices/${deviceId}`, {
+  }, echo: 'minimal' | 'full' = 'minimal'): Promise<{ success: boolean; device?: Device; id?: string; updated_at?: string }> {
+    return this.request(`/schemas/${schemaId}/devices/${deviceId}?echo=${echo}`, {
       method: 'PUT',
       body: JSON.stringify(data),
     });
@@ -731,8 +731,8 @@ class ApiService {
     bandwidth?: number;
     vlan_id?: number;
     config_json?: Record<string, any>;
-  }): Promise<{ success: boolean; connection: Connection }> {
-    return this.request(`/schemas/${schemaId}/connections/${connectionId}`, {
+  }, echo: 'minimal' | 'full' = 'minimal'): Promise<{ success: boolean; connection?: Connection; id?: string; updated_at?: string }> {
+    return this.request(`/schemas/${schemaId}/connections/${connectionId}?echo=${echo}`, {
       method: 'PUT',
       body: JSON.stringify(data),
     });